@@ -1,7 +1,5 @@
-import math, random, heapq, pygame
+import math, random, heapq
 from config import (
-    FOV_DEGREES,
-    FOV_RANGE,
     BOT_SPEED,
     REVIVE_MS,
     REVIVE_RANGE,
@@ -9,10 +7,18 @@ from config import (
     DEFUSE_MS,
     SEP_RADIUS,
     SEP_STRENGTH,
+    NAV_MODE,
 )
-from map import (pos_to_cell, cell_center, nearest_passable_cell,
-                 move_with_collision, has_line_of_sight)
+from map import pos_to_cell, cell_center, nearest_passable_cell, move_with_collision
+from los import line_of_sight
+from perception import in_view
 from entities import Bullet
+from flowfield import FlowFieldService
+from jps import jps_path
+from hpa import hpa_path
+from dstar import IncrementalPlanner
+from gameclock import get_ticks
+from profiler import PROFILER
 
 # vector helpers
 
@@ -31,14 +37,12 @@ def angle_between(u,v):
     return math.degrees(math.acos(c))
 
 def sees(A,B,walls):
+    """Single pair visibility test; a tick's bots read :mod:`perception` instead."""
     if not getattr(B, 'alive', False):
         return False
-    dx,dy=B.x-A.x, B.y-A.y
-    if dx*dx+dy*dy > FOV_RANGE*FOV_RANGE:
+    if not in_view(A.x,A.y,A.dir[0],A.dir[1],B.x,B.y):
         return False
-    if angle_between(A.dir,(dx,dy))>FOV_DEGREES*0.5:
-        return False
-    if not has_line_of_sight((A.x,A.y),(B.x,B.y),walls):
+    if not line_of_sight((A.x,A.y),(B.x,B.y),walls):
         return False
     return True
 
@@ -55,6 +59,7 @@ def astar(grid,start,goal):
     while openh:
         _,cur=heapq.heappop(openh)
         if cur==goal:
+            PROFILER.count("path.nodes",len(g))
             path=[]
             while cur: path.append(cur); cur=came[cur]
             return list(reversed(path))
@@ -68,10 +73,15 @@ def astar(grid,start,goal):
             if nb not in g or ng<g[nb]:
                 g[nb]=ng; came[nb]=cur
                 heapq.heappush(openh,(ng+h(nb,goal),nb))
+    PROFILER.count("path.nodes",len(g))
     return None
 
 # avoidance
 
+# agents move at most this far within a tick, so neighbour queries against the
+# grid built at the start of the tick are padded by it
+NEIGHBOUR_PAD = 8
+
 def separation_force(agent, friends, radius=SEP_RADIUS, strength=SEP_STRENGTH):
     fx=fy=0.0
     for f in friends:
@@ -84,73 +94,200 @@ def separation_force(agent, friends, radius=SEP_RADIUS, strength=SEP_STRENGTH):
             fy += dy*inv*strength
     return (fx,fy)
 
+# path following
+
+FLOW_FIELDS = FlowFieldService()
+
+PLANNERS = {"astar": astar, "jps": jps_path, "hpa": hpa_path}
+
+def _path_plan(grid, nav, start, goal, now, mode='astar', paths=None):
+    """Replan the bot's path on goal change or every 300 ms.
+
+    With a :class:`pathpool.PathPool` in ``paths`` the plan is only requested
+    and :func:`_path_collect` picks it up once it is in.
+    """
+    pending=nav.get('pending')
+    if pending is not None and pending[2]==goal:
+        return  # a plan for this goal is on its way
+    recalc = (nav['goal']!=goal or nav['path'] is None or now-nav['last_compute']>300)
+    if recalc:
+        PROFILER.count("path.recompute")
+        with PROFILER.scope("path"):
+            if pending is not None:
+                # the goal changed since the request went out
+                paths.release(pending); nav['pending']=None
+            if mode=='dstar':
+                # repair the bot's own search tree; the new path starts at the
+                # bot's cell, so carry on towards the next one
+                planner=nav.get('planner')
+                if planner is None or planner.grid is not grid:
+                    planner=nav['planner']=IncrementalPlanner(grid,start,goal)
+                before=planner.expanded
+                nav['path']=planner.replan(start,goal)
+                PROFILER.count("path.nodes",planner.expanded-before)
+                nav['idx']=1 if nav['path'] and len(nav['path'])>1 else 0
+            else:
+                # the first plan of a round may have been made in advance
+                warm=nav.pop('warm',None)
+                if warm is not None and warm[0]==start and warm[1]==goal:
+                    nav['path']=warm[2]; nav['idx']=0
+                elif paths is not None:
+                    # keep following the current path meanwhile
+                    nav['pending']=paths.request(mode,start,goal)
+                else:
+                    nav['path']=PLANNERS[mode](grid,start,goal); nav['idx']=0
+        nav['goal']=goal; nav['last_compute']=now
+
+def _resume_index(agent, path):
+    """Waypoint to head for on ``path`` from where the bot is now.
+
+    The path was planned from the cell the bot stood on when it asked, and
+    the bot kept moving since.  Heading for ``path[0]`` would turn it around,
+    so it continues with the end of the path segment closest to it.
+    """
+    if len(path)<2:
+        return 0
+    best=0; best_d=None
+    prev=cell_center(*path[0])
+    for i in range(1,len(path)):
+        cur=cell_center(*path[i])
+        sx=cur[0]-prev[0]; sy=cur[1]-prev[1]
+        l2=sx*sx+sy*sy
+        t=0.0 if l2==0 else max(0.0,min(1.0,((agent.x-prev[0])*sx+(agent.y-prev[1])*sy)/l2))
+        dx=prev[0]+t*sx-agent.x; dy=prev[1]+t*sy-agent.y
+        d=dx*dx+dy*dy
+        if best_d is None or d<best_d:
+            best=i; best_d=d
+        prev=cur
+    return best
+
+def _path_collect(agent, nav, paths):
+    """Switch to the requested path once the pool has planned it."""
+    key=nav.get('pending')
+    if key is None:
+        return
+    if key not in paths:
+        # dropped by the pool; keep the current path and ask again next think
+        nav['pending']=None; nav['goal']=None
+        return
+    done,path=paths.poll(key)
+    if not done:
+        return
+    nav['pending']=None; nav['path']=path
+    nav['idx']=_resume_index(agent, path) if path else 0
+
+def _path_follow(agent, nav):
+    """Steer towards the next waypoint of the bot's current path."""
+    path=nav['path']
+    if not path:
+        return (0.0,0.0)
+    idx=nav['idx']
+    if idx>=len(path): idx=len(path)-1
+    wp=cell_center(*path[idx])
+    to_wp=(wp[0]-agent.x, wp[1]-agent.y)
+    if vec_len(to_wp)<6 and idx<len(path)-1:
+        idx+=1; nav['idx']=idx; wp=cell_center(*path[idx]); to_wp=(wp[0]-agent.x, wp[1]-agent.y)
+    return norm_vec(to_wp)
+
+def _field_steer(agent, grid, nav, start, goal, now):
+    """Head for the next cell of the flow field shared by every bot with ``goal``."""
+    nav['goal']=goal
+    nxt=FLOW_FIELDS.get(grid, goal, now).next_cell(start)
+    if nxt is None:
+        return (0.0,0.0)
+    wp=cell_center(*nxt)
+    return norm_vec((wp[0]-agent.x, wp[1]-agent.y))
+
 # main AI
+#
+# A bot's tick is split in two.  bot_think makes the decisions (revive an
+# ally, where to go, whom to shoot) and replans; its result is kept in the
+# bot's nav entry.  bot_steer acts on the last decisions: it follows the path,
+# keeps distance to allies, shoots and advances revive/plant/defuse timers.
+# bot_ai runs both; sim.Simulation lets a scheduler.AIScheduler decide
+# on which ticks a bot thinks.
 
-def bot_ai(agent, enemies, friends, walls, bullets, grid, nav, bomb):
+def bot_think(agent, enemies, friends, walls, grid, nav, bomb, perception=None, neighbours=None, paths=None):
+    """Decisions of a bot, stored in ``nav`` for :func:`bot_steer`."""
     if agent.downed or not (agent.alive or agent.downed):
         return
-    now=pygame.time.get_ticks()
+    now=get_ticks()
+    if perception is not None:
+        visible=perception.visible(agent)
+    else:
+        visible=[e for e in enemies if sees(agent,e,walls)]
 
     # check for downed ally
     nearest_downed=None; best=1e9
-    for fr in friends:
+    near=friends if neighbours is None else neighbours.near_downed(agent.x, agent.y, 2*REVIVE_RANGE+NEIGHBOUR_PAD)
+    for fr in near:
         if fr.downed:
             d=(agent.x-fr.x)**2+(agent.y-fr.y)**2
             if d<best:
                 best=d; nearest_downed=fr
     do_revive=False
     if nearest_downed is not None and best <= (REVIVE_RANGE*REVIVE_RANGE*4):
-        target_cell=pos_to_cell(nearest_downed.pos)
+        target_cell=pos_to_cell(nearest_downed.pos, grid)
         do_revive=True
     else:
         # perceive enemy
-        for e in enemies:
-            if e.alive and sees(agent,e,walls):
+        for e in visible:
+            if e.alive:
                 agent.last_known_enemy=e.pos; break
         target_cell=None
         if bomb.state=='idle':
             if agent.team=='ATT':
-                if bomb.in_zone(agent.pos):
-                    do_plant=True
-                else:
-                    target_cell=pos_to_cell(bomb.zone_center)
+                if not bomb.in_zone(agent.pos):
+                    target_cell=pos_to_cell(bomb.zone_center, grid)
             else:
-                target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center)
+                target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center, grid)
         elif bomb.state=='planted':
             if agent.team=='DEF':
-                if bomb.in_zone(agent.pos):
-                    do_defuse=True
-                else:
-                    target_cell=pos_to_cell(bomb.zone_center)
+                if not bomb.in_zone(agent.pos):
+                    target_cell=pos_to_cell(bomb.zone_center, grid)
             else:
-                target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center)
+                target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center, grid)
         else:
-            target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center)
-        do_plant=False; do_defuse=False
+            target_cell=pos_to_cell(agent.last_known_enemy or bomb.zone_center, grid)
+    nav['revive']=nearest_downed if do_revive else None
+    nav['enemy']=next((e for e in visible if e.alive), None)
 
-    # movement
+    # route
+    goal=None
     if agent.lock_reason is None and agent.alive and not agent.downed:
         goal = nearest_passable_cell(grid, target_cell) if target_cell else None
-        start = pos_to_cell(agent.pos)
-        if goal is not None:
-            recalc = (nav['goal']!=goal or nav['path'] is None or now-nav['last_compute']>300)
-            if recalc:
-                nav['path']=astar(grid,start,goal)
-                nav['goal']=goal; nav['idx']=0; nav['last_compute']=now
-            path=nav['path']
-            if path:
-                idx=nav['idx']
-                if idx>=len(path): idx=len(path)-1
-                wp=cell_center(*path[idx])
-                to_wp=(wp[0]-agent.x, wp[1]-agent.y)
-                if vec_len(to_wp)<6 and idx<len(path)-1:
-                    idx+=1; nav['idx']=idx; wp=cell_center(*path[idx]); to_wp=(wp[0]-agent.x, wp[1]-agent.y)
-                steer=norm_vec(to_wp)
-            else:
-                steer=(0.0,0.0)
-        else:
+        mode = nav.get('mode') or NAV_MODE
+        if goal is not None and mode!='flowfield':
+            _path_plan(grid, nav, pos_to_cell(agent.pos, grid), goal, now, mode, paths)
+    nav['target']=goal
+
+def bot_steer(agent, enemies, friends, walls, bullets, grid, nav, bomb, perception=None, neighbours=None, paths=None):
+    """Act on the decisions of the bot's last :func:`bot_think`."""
+    if agent.downed or not (agent.alive or agent.downed):
+        return
+    now=get_ticks()
+    nearest_downed=nav.get('revive')
+    if nearest_downed is not None and not nearest_downed.downed:
+        # revived or bled out since the bot decided to help
+        nearest_downed=None
+    do_revive=nearest_downed is not None
+
+    # movement
+    if agent.lock_reason is None and agent.alive and not agent.downed:
+        goal = nav.get('target')
+        mode = nav.get('mode') or NAV_MODE
+        if goal is None:
             steer=(0.0,0.0)
-        sep=separation_force(agent,friends)
+        elif mode=='flowfield':
+            steer=_field_steer(agent, grid, nav, pos_to_cell(agent.pos, grid), goal, now)
+        else:
+            if paths is not None:
+                _path_collect(agent, nav, paths)
+            steer=_path_follow(agent, nav)
+        near=friends
+        if neighbours is not None:
+            near=neighbours.near(agent.x, agent.y, SEP_RADIUS+NEIGHBOUR_PAD)
+        sep=separation_force(agent,near)
         steer=(steer[0]+sep[0], steer[1]+sep[1])
         l=vec_len(steer)
         if l>0:
@@ -161,14 +298,16 @@ def bot_ai(agent, enemies, friends, walls, bullets, grid, nav, bomb):
         if vec_len((vx,vy))>0:
             agent.dir=norm_vec((vx,vy))
 
-    # combat
+    # combat: only at the chosen enemy while it is still in sight
     if not do_revive and agent.lock_reason is None and agent.alive:
-        target=None
-        for e in enemies:
-            if e.alive and sees(agent,e,walls) and has_line_of_sight(agent.pos,e.pos,walls):
-                target=e; break
-        if target:
-            agent.shoot(target.pos, now, bullets)
+        target=nav.get('enemy')
+        if target is not None and target.alive:
+            if perception is not None:
+                in_sight=perception.sees(agent, target)
+            else:
+                in_sight=sees(agent, target, walls)
+            if in_sight:
+                agent.shoot(target.pos, now, bullets)
 
     # revive lock
     if do_revive:
@@ -203,3 +342,14 @@ def bot_ai(agent, enemies, friends, walls, bullets, grid, nav, bomb):
         else:
             if agent.lock_reason in ('plant','defuse'):
                 agent.lock_reason=None
+
+def bot_ai(agent, enemies, friends, walls, bullets, grid, nav, bomb, perception=None, neighbours=None, paths=None):
+    """One tick of a bot: :func:`bot_think` followed by :func:`bot_steer`.
+
+    ``perception`` supplies the enemies visible this tick and ``neighbours``
+    (a :class:`spatial.AgentGrid` over ``friends``) limits the ally scans to
+    nearby agents; without them every enemy and friend is tested.  With a
+    :class:`pathpool.PathPool` in ``paths`` replanning does not block.
+    """
+    bot_think(agent, enemies, friends, walls, grid, nav, bomb, perception, neighbours, paths)
+    bot_steer(agent, enemies, friends, walls, bullets, grid, nav, bomb, perception, neighbours, paths)
@@ -0,0 +1,173 @@
+"""Batch runner for bot-only rounds.
+
+Rounds are simulated headlessly with :class:`sim.Simulation` and spread over a
+process pool, one seed per round.  Every worker builds the static world once
+and reuses it for all of its rounds so the per-round cost is pure simulation.
+With ``--procedural`` the rounds are played on a generated chunked world
+(see :mod:`chunks`) instead, generated on demand in every worker; rounds
+stay near the two bomb sites, which lie a few chunks apart at most, since
+bots plan with A* over the chunked grid.
+Results are streamed into a single CSV or JSON report as rounds finish::
+
+    python batch.py --rounds 2000 --workers 8 --out balance.csv
+    python batch.py --rounds 20 --team-size 128 --nav-mode flowfield --out stress.json
+    python batch.py --rounds 50 --procedural 7 --chunks 4x4 --out generated.csv
+"""
+
+import argparse, csv, json, os, sys, time
+from multiprocessing import Pool
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from config import TICK_MS, TEAM_SIZE, PROC_CHUNKS, PROC_SITE_CHUNKS
+
+FIELDS = [
+    "seed",
+    "winner",
+    "reason",
+    "round_ms",
+    "plants",
+    "defuses",
+    "revives",
+    "damage_att",
+    "damage_def",
+]
+
+# per worker process state, filled in by _init_worker
+_world = None
+
+
+def _init_worker(procedural=None, chunks=None):
+    global _world
+    from sim import static_world
+    from map import build_procedural_world
+
+    if procedural is None:
+        _world = static_world()
+    else:
+        walls, grid, _, _ = build_procedural_world(procedural, chunks)
+        _world = (walls, grid)
+
+
+def play_round(seed, max_ms=180_000, dt_ms=TICK_MS, world=None, team_size=TEAM_SIZE, nav_mode=None):
+    """Simulate one bot-only round and return its result row."""
+
+    from sim import Simulation
+
+    sim = Simulation(seed=seed, with_player=False, world=world or _world,
+                     team_size=team_size, nav_mode=nav_mode)
+    sim.run_round(dt_ms, max_ms)
+    row = {
+        "seed": seed,
+        "winner": sim.winner or "",
+        "reason": sim.reason or "timeout",
+        "round_ms": round(sim.now - sim.round_start),
+    }
+    row.update(sim.stats)
+    return row
+
+
+def _play(args):
+    return play_round(*args)
+
+
+class _CsvReport:
+    def __init__(self, fh):
+        self.writer = csv.DictWriter(fh, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def add(self, row):
+        self.writer.writerow(row)
+
+    def close(self, summary):
+        pass
+
+
+class _JsonReport:
+    def __init__(self, fh):
+        self.fh = fh
+        self.first = True
+        fh.write('{"rounds": [\n')
+
+    def add(self, row):
+        if not self.first:
+            self.fh.write(",\n")
+        self.first = False
+        self.fh.write(json.dumps(row))
+
+    def close(self, summary):
+        self.fh.write('\n], "summary": %s}\n' % json.dumps(summary))
+
+
+def summarize(rows):
+    """Aggregate win rates and averages over a list of result rows."""
+
+    n = len(rows)
+    if not n:
+        return {"rounds": 0}
+    summary = {"rounds": n}
+    for team in ("ATT", "DEF"):
+        summary[f"{team.lower()}_win_rate"] = sum(r["winner"] == team for r in rows) / n
+    summary["reasons"] = {}
+    for r in rows:
+        summary["reasons"][r["reason"]] = summary["reasons"].get(r["reason"], 0) + 1
+    for key in FIELDS[3:]:
+        summary[f"mean_{key}"] = sum(r[key] for r in rows) / n
+    return summary
+
+
+def run_batch(rounds, out, workers=None, seed=0, max_ms=180_000, team_size=TEAM_SIZE, nav_mode=None,
+              procedural=None, chunks=None):
+    """Play ``rounds`` rounds over ``workers`` processes into report ``out``.
+
+    With ``procedural`` (a world seed) the rounds run on a generated world of
+    ``chunks`` (columns, rows) chunks.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed + i, max_ms, TICK_MS, None, team_size, nav_mode) for i in range(rounds)]
+    report_cls = _JsonReport if out.endswith(".json") else _CsvReport
+    rows = []
+    with open(out, "w", newline="") as fh, Pool(workers, initializer=_init_worker,
+                                                  initargs=(procedural, chunks)) as pool:
+        report = report_cls(fh)
+        for row in pool.imap_unordered(_play, jobs):
+            report.add(row)
+            fh.flush()
+            rows.append(row)
+        summary = summarize(rows)
+        report.close(summary)
+    return summary
+
+
+def _chunks_arg(text):
+    cols, _, rows = text.partition("x")
+    return int(cols), int(rows or cols)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run bot-vs-bot rounds in parallel.")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first round")
+    parser.add_argument("--max-round-ms", type=int, default=180_000, help="game time before a round counts as a timeout")
+    parser.add_argument("--out", default="batch_results.csv", help="report path, .csv or .json")
+    parser.add_argument("--team-size", type=int, default=TEAM_SIZE, help="bots per team, up to 256")
+    parser.add_argument("--nav-mode", default=None, help="path finding engine for all bots, e.g. flowfield for large teams")
+    parser.add_argument("--procedural", type=int, default=None, metavar="SEED",
+                        help="play on a generated chunked world with this seed")
+    parser.add_argument("--chunks", type=_chunks_arg, default=None, metavar="COLSxROWS",
+                        help="size of the generated world in chunks, e.g. 4x4 (default "
+                        f"{PROC_CHUNKS}x{PROC_CHUNKS}; rounds are played within {PROC_SITE_CHUNKS}x{PROC_SITE_CHUNKS} of them)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = run_batch(args.rounds, args.out, args.workers, args.seed, args.max_round_ms,
+                        args.team_size, args.nav_mode, args.procedural, args.chunks)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+    print(f"{args.rounds} rounds in {elapsed:.1f}s ({args.rounds / elapsed:.2f} rounds/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
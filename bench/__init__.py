@@ -0,0 +1,5 @@
+"""Performance benchmarks.
+
+Run a module directly, e.g. ``python -m bench.pathfinding``.
+``python -m bench.suite`` runs the whole suite against a stored baseline.
+"""
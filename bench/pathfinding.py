@@ -0,0 +1,114 @@
+"""Compare :func:`ai.astar` with the other path finding engines on the static map.
+
+Usage::
+
+    python -m bench.pathfinding [--pairs 200] [--seed 1]
+
+Start/goal pairs are drawn from the walkable cells of
+:func:`map.build_static_map` with a fixed seed so runs are comparable.
+"""
+
+import argparse, math, os, random, time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from map import build_static_map, build_grid
+from ai import astar
+from jps import JumpPointSearch
+from hpa import HierarchicalPlanner
+from dstar import IncrementalPlanner
+
+
+def path_cost(path):
+    """Octile length of a waypoint list in cells."""
+
+    total = 0.0
+    for a, b in zip(path, path[1:]):
+        dx = abs(a[0] - b[0]); dy = abs(a[1] - b[1])
+        if dx == 0 or dy == 0 or dx == dy:
+            total += max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+        else:
+            total += math.hypot(dx, dy)
+    return total
+
+
+def make_pairs(grid, n, seed):
+    rng = random.Random(seed)
+    cells = [(c, r) for c, col in enumerate(grid) for r, ok in enumerate(col) if ok]
+    return [(rng.choice(cells), rng.choice(cells)) for _ in range(n)]
+
+
+def run(pairs_n=200, seed=1):
+    grid = build_grid(build_static_map())
+    pairs = make_pairs(grid, pairs_n, seed)
+    engine = JumpPointSearch(grid)
+    hpa = HierarchicalPlanner(grid)
+
+    results = {}
+    engines = (
+        ("astar", lambda s, g: astar(grid, s, g)),
+        ("jps", engine.find_path),
+        ("hpa", hpa.find_path),
+    )
+    for name, find in engines:
+        start = time.perf_counter()
+        paths = [find(s, g) for s, g in pairs]
+        elapsed = time.perf_counter() - start
+        found = [p for p in paths if p]
+        results[name] = {
+            "ms_per_path": 1000 * elapsed / len(pairs),
+            "mean_waypoints": sum(len(p) for p in found) / max(1, len(found)),
+            "mean_length": sum(path_cost(p) for p in found) / max(1, len(found)),
+        }
+    results["jps"]["mean_expanded"] = engine.expanded / len(pairs)
+    return results
+
+
+def run_chase(steps=300, seed=1):
+    """Replanning cost while a chaser follows a wandering target.
+
+    Every step the chaser advances one cell along its path and the target
+    takes a random step, then both engines replan.
+    """
+
+    grid = build_grid(build_static_map())
+    rng = random.Random(seed)
+    cells = [(c, r) for c, col in enumerate(grid) for r, ok in enumerate(col) if ok]
+    chaser = rng.choice(cells)
+    target = rng.choice(cells)
+    planner = IncrementalPlanner(grid, chaser, target)
+    t_astar = t_dstar = 0.0
+    for _ in range(steps):
+        x, y = target
+        moves = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+        moves = [m for m in moves if 0 <= m[0] < len(grid) and 0 <= m[1] < len(grid[0]) and grid[m[0]][m[1]]]
+        if moves:
+            target = rng.choice(moves)
+        start = time.perf_counter()
+        ref = astar(grid, chaser, target)
+        t_astar += time.perf_counter() - start
+        start = time.perf_counter()
+        path = planner.replan(chaser, target)
+        t_dstar += time.perf_counter() - start
+        assert (path is None) == (ref is None) and (not path or len(path) == len(ref))
+        if path and len(path) > 1:
+            chaser = path[1]
+    return {"astar_ms": 1000 * t_astar / steps, "dstar_ms": 1000 * t_dstar / steps}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    results = run(args.pairs, args.seed)
+    print(f"{'engine':<8}{'ms/path':>10}{'waypoints':>12}{'length':>10}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['ms_per_path']:>10.2f}{r['mean_waypoints']:>12.1f}{r['mean_length']:>10.1f}")
+    print(f"jps expanded {results['jps']['mean_expanded']:.1f} jump points per search")
+    chase = run_chase(seed=args.seed)
+    print(f"chase replan: astar {chase['astar_ms']:.2f} ms, dstar {chase['dstar_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
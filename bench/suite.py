@@ -0,0 +1,346 @@
+"""Benchmark suite with a stored baseline and a regression gate.
+
+Usage::
+
+    python -m bench.suite --save              # measure and store bench/baseline.json
+    python -m bench.suite                     # measure and compare with the baseline
+    python -m bench.suite --only astar,tick_4v4 --tolerance 0.3 --tolerance frame=0.5
+
+Every benchmark builds a reproducible scenario on :func:`map.build_static_map`:
+seeded start/goal pairs, sight lines and moves, seeded spawns with a fixed bomb
+zone, bullet storms and large team rounds; one more round is played on a small
+generated chunked world.  Micro benchmarks time single calls
+of :func:`map.build_grid`, :func:`ai.astar`, :func:`map.has_line_of_sight`,
+:func:`map.move_with_collision` and the bots of one tick as scheduled by
+:class:`scheduler.AIScheduler`; the others time whole headless ticks of
+:class:`sim.Simulation` and a full frame drawn off screen.
+
+The scenario is rebuilt before every repeat, so each repeat times the same
+work, and the fastest repeat is reported in milliseconds per operation (the
+median is kept alongside); slower repeats mostly measure other load on the
+machine.  A run compared with the baseline fails (exit status 1) when a
+benchmark got slower than its tolerance allows, and a comparison without a
+baseline fails before measuring anything (exit status 2); only ``--save``
+creates one.  Baselines are machine specific; save one on the machine the
+comparison runs on.
+"""
+
+import argparse, itertools, json, os, platform, random, statistics, sys, time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from config import TICK_MS, VIEW_W, VIEW_H, WIDTH, HEIGHT, RADIUS, BOT_SPEED
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+REPEAT = 5
+TOLERANCE = 0.25
+SEED = 1
+# bomb zones used instead of a random one: centre in pixels, radius in cells
+ZONES = ((1500, 1500, 3), (600, 2400, 2))
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number):
+    """Register ``setup`` as benchmark ``name``.
+
+    ``setup()`` builds the scenario and returns the operation to time, which
+    is called ``number`` times per repeat.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def _world():
+    from map import build_static_map, build_grid
+
+    walls = build_static_map()
+    return walls, build_grid(walls)
+
+
+def _cells(grid):
+    return [(c, r) for c, col in enumerate(grid) for r, ok in enumerate(col) if ok]
+
+
+def _simulation(team_size, nav_mode=None, zone=0, ticks=0):
+    """Bot-only round on the static map with bomb zone ``ZONES[zone]``."""
+
+    from entities import BombState
+    from sim import Simulation
+
+    sim = Simulation(seed=SEED, with_player=False, world=_world(),
+                     team_size=team_size, nav_mode=nav_mode)
+    x, y, radius = ZONES[zone]
+    sim.bomb = BombState((x, y), radius)
+    for _ in range(ticks):
+        sim.step()
+    return sim
+
+
+# ---------------------------------------------------------------------------
+# micro benchmarks
+# ---------------------------------------------------------------------------
+
+@benchmark("build_grid", number=10)
+def _build_grid():
+    from map import build_static_map, build_grid
+
+    walls = build_static_map()
+    return lambda: build_grid(walls)
+
+
+@benchmark("astar", number=50)
+def _astar():
+    from ai import astar
+
+    _, grid = _world()
+    rng = random.Random(SEED)
+    cells = _cells(grid)
+    pairs = itertools.cycle([(rng.choice(cells), rng.choice(cells)) for _ in range(50)])
+    return lambda: astar(grid, *next(pairs))
+
+
+@benchmark("line_of_sight", number=2000)
+def _line_of_sight():
+    from map import has_line_of_sight
+
+    walls, _ = _world()
+    rng = random.Random(SEED)
+    segs = itertools.cycle([((rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)),
+                             (rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)))
+                            for _ in range(2000)])
+    has_line_of_sight((0, 0), (1, 1), walls)
+    return lambda: has_line_of_sight(*next(segs), walls)
+
+
+@benchmark("move_with_collision", number=2000)
+def _move_with_collision():
+    from map import move_with_collision
+
+    walls, _ = _world()
+    rng = random.Random(SEED)
+    # start next to a wall half of the time so collisions actually resolve
+    moves = []
+    for i in range(2000):
+        x, y, w, h = walls[i % len(walls)] if i % 2 else (0, 0, WIDTH, HEIGHT)
+        moves.append((rng.uniform(x, x + w), rng.uniform(y, y + h),
+                      rng.uniform(-BOT_SPEED, BOT_SPEED), rng.uniform(-BOT_SPEED, BOT_SPEED)))
+    moves = itertools.cycle(moves)
+    return lambda: move_with_collision(*next(moves), RADIUS, walls)
+
+
+def _bots(team_size, nav_mode=None):
+    sim = _simulation(team_size, nav_mode, ticks=60)
+
+    def run():
+        sim.clock.advance(TICK_MS)
+        sim._run_bots()
+    return run
+
+
+@benchmark("bot_ai_4v4", number=60)
+def _bot_ai_4v4():
+    return _bots(4)
+
+
+@benchmark("bot_ai_32v32", number=20)
+def _bot_ai_32v32():
+    return _bots(32, "flowfield")
+
+
+@benchmark("bullet_storm", number=30)
+def _bullet_storm():
+    from entities import BulletPool
+
+    sim = _simulation(16, zone=1)
+    rng = random.Random(SEED)
+    shots = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.uniform(-20, 20), rng.uniform(-20, 20),
+              rng.choice(("ATT", "DEF")), 10) for _ in range(2000)]
+    pool = BulletPool()
+
+    def run():
+        if not len(pool):
+            for shot in shots:
+                pool.spawn(*shot)
+        pool.update(sim.walls, sim.agents)
+    return run
+
+
+# ---------------------------------------------------------------------------
+# whole ticks and frames
+# ---------------------------------------------------------------------------
+
+@benchmark("tick_4v4", number=300)
+def _tick_4v4():
+    return _simulation(4).step
+
+
+@benchmark("tick_32v32", number=100)
+def _tick_32v32():
+    return _simulation(32, "flowfield", zone=1).step
+
+
+@benchmark("tick_128v128", number=30)
+def _tick_128v128():
+    return _simulation(128, "flowfield", zone=1).step
+
+
+@benchmark("tick_chunked", number=100)
+def _tick_chunked():
+    from map import build_procedural_world
+    from sim import Simulation
+
+    walls, grid, _, _ = build_procedural_world(SEED, (3, 3))
+    sim = Simulation(seed=SEED, with_player=False, world=(walls, grid), team_size=4)
+    return sim.step
+
+
+@benchmark("frame", number=100)
+def _frame():
+    import pygame
+    from render import BackgroundLayer
+    from text import get_font
+    from ui import Minimap
+
+    sim = _simulation(4)
+    screen = pygame.Surface((VIEW_W, VIEW_H))
+    background = BackgroundLayer()
+    minimap = Minimap()
+    font = get_font(18)
+    viewer = sim.attackers[0]
+
+    def run():
+        sim.step()
+        cam = (min(max(viewer.x - VIEW_W // 2, 0), WIDTH - VIEW_W),
+               min(max(viewer.y - VIEW_H // 2, 0), HEIGHT - VIEW_H))
+        background.draw(screen, sim.walls, cam)
+        for a in sim.agents:
+            a.draw(screen, cam, font)
+        sim.bullets.draw(screen, cam)
+        minimap.draw(screen, viewer, sim.walls, sim.bomb, sim.agents)
+    return run
+
+
+# ---------------------------------------------------------------------------
+# running and comparing
+# ---------------------------------------------------------------------------
+
+def measure(name, repeat=REPEAT):
+    """Fastest and median milliseconds per operation of benchmark ``name``."""
+
+    setup, number = BENCHMARKS[name]
+    samples = []
+    for _ in range(repeat):
+        op = setup()
+        op()  # warm caches that the first call fills
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append(1000 * (time.perf_counter() - start) / number)
+    return {"ms": min(samples), "median_ms": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def run_suite(names=None, repeat=REPEAT, progress=None):
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = measure(name, repeat)
+        if progress:
+            progress(name, results[name])
+    return {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(run, baseline, tolerance=TOLERANCE, tolerances=None):
+    """Rows ``(name, base_ms, ms, ratio, status)`` for benchmarks in both runs.
+
+    ``status`` is ``"slower"`` when ``ms`` exceeds the baseline by more than
+    the benchmark's tolerance (a fraction, ``tolerances`` overrides per name),
+    ``"faster"`` when it is below by more than that and ``"ok"`` otherwise.
+    """
+
+    tolerances = tolerances or {}
+    rows = []
+    for name, res in run["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        tol = tolerances.get(name, tolerance)
+        ratio = res["ms"] / base["ms"] if base["ms"] else float("inf")
+        status = "slower" if ratio > 1 + tol else "faster" if ratio < 1 - tol else "ok"
+        rows.append((name, base["ms"], res["ms"], ratio, status))
+    return rows
+
+
+def _tolerance_arg(text):
+    if "=" in text:
+        name, value = text.split("=", 1)
+        return name, float(value)
+    return None, float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare it with a baseline.")
+    parser.add_argument("--only", default=None, help="comma separated benchmark names, default all")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON path")
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline instead of comparing")
+    parser.add_argument("--out", default=None, help="also write this run's results to a JSON file")
+    parser.add_argument("--tolerance", action="append", type=_tolerance_arg, default=[],
+                        help=f"allowed slowdown as a fraction (default {TOLERANCE}), or NAME=FRACTION for one benchmark")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    names = args.only.split(",") if args.only else None
+    unknown = [n for n in names or () if n not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark: " + ", ".join(unknown))
+    tolerance = TOLERANCE
+    tolerances = {}
+    for name, value in args.tolerance:
+        if name is None:
+            tolerance = value
+        else:
+            tolerances[name] = value
+    if not args.save and not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; store one with --save", file=sys.stderr)
+        return 2
+
+    def progress(name, res):
+        print(f"{name:<22}{res['ms']:>10.3f} ms  (median {res['median_ms']:.3f}, {res['number']} ops x {res['repeat']})",
+              file=sys.stderr)
+
+    run = run_suite(names, args.repeat, progress)
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(run, fh, indent=2)
+    if args.save:
+        with open(args.baseline, "w") as fh:
+            json.dump(run, fh, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    rows = compare(run, baseline, tolerance, tolerances)
+    print(f"{'benchmark':<22}{'baseline':>10}{'now':>10}{'ratio':>8}  status")
+    for name, base_ms, ms, ratio, status in rows:
+        print(f"{name:<22}{base_ms:>10.3f}{ms:>10.3f}{ratio:>8.2f}  {status}")
+    slower = [r[0] for r in rows if r[4] == "slower"]
+    if slower:
+        print("regressed: " + ", ".join(slower))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
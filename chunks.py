@@ -0,0 +1,347 @@
+"""Chunked procedural worlds generated on demand.
+
+A generated arena can be far larger than the built-in map, too large for one
+wall list and one walkability grid.  :class:`ChunkWorld` splits it into square
+chunks of ``CHUNK_CELLS`` grid cells.  A chunk is generated from
+``(seed, cx, cy)`` alone the first time it is touched, so the same seed always
+gives the same world no matter in which order chunks are visited, and at most
+``max_resident`` chunks are kept in an LRU; evicted chunks are simply
+generated again.
+
+Every chunk carries its own walls (indexed in a :class:`spatial.WallIndex`),
+its walkability tiles, the cover cells next to its walls and a candidate site
+(the cell farthest from any wall).  Walls keep a margin from the chunk border
+wide enough that a chunk's tiles only depend on its own walls.
+
+The rest of the game reaches the chunks through two proxies:
+
+* :class:`ChunkWalls` answers the index queries of :class:`spatial.WallIndex`
+  (``box_indices``, ``circle_indices``, ``point_indices``,
+  ``segment_indices`` and the ``near_*`` variants), with wall ids that stay
+  valid across evictions, so :func:`map.move_with_collision`, bullets,
+  background rendering and :func:`los.engine_for` work unchanged.  It cannot
+  be iterated; that would generate the whole world.
+* :class:`ChunkGrid` is indexed ``grid[col][row]`` like the nested list grids,
+  which is what :func:`ai.astar` needs.  It answers
+  :func:`map.nearest_passable_cell` and :func:`map.pos_to_cell` itself and
+  hands the world's bounds and bomb sites to :mod:`sim`, which places the
+  bomb zone on a site and the teams at the sites instead of the corners of
+  the built-in map.  Engines that copy the whole grid into arrays (flow
+  fields, JPS, HPA*, D* Lite, the clearance map, a path pool) are not meant
+  for chunked worlds; bots on them plan with A*.
+
+A* through :class:`ChunkGrid` pays a proxy lookup per cell and generates
+every chunk its search touches, so it only suits routes across a few chunks,
+not across the whole world: on 32 by 32 chunks two sites in opposite corners
+are thousands of cells apart and a single search takes seconds.  The bomb
+sites are therefore kept within ``PROC_SITE_CHUNKS`` chunks of each other
+and a round only plays out around them.
+"""
+
+import random
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from config import GRID, RADIUS, CHUNK_CELLS, PROC_CHUNKS, PROC_SITE_CHUNKS, CHUNK_CACHE
+from spatial import WallIndex
+from clearance import squared_edt, ring_offsets, NEAREST_RING
+from map import build_grid_array, rect_edges, seg_intersect
+from profiler import PROFILER
+
+# wall ids are chunk_index * WALL_STRIDE + position in the chunk
+WALL_STRIDE = 64
+BORDER = 18
+WALL_THICKNESS = 40
+
+
+class Chunk:
+    """Walls, walkability and points of interest of one chunk."""
+
+    __slots__ = ("cx", "cy", "walls", "edges", "tiles", "cover", "site")
+
+    def __init__(self, cx, cy, walls, tiles, cover, site):
+        self.cx, self.cy = cx, cy
+        self.walls = walls
+        self.edges = None
+        self.tiles = tiles
+        self.cover = cover
+        self.site = site
+
+    def wall_edges(self):
+        if self.edges is None:
+            self.edges = [rect_edges(r) for r in self.walls]
+        return self.edges
+
+
+def generate_chunk(seed, cx, cy, nx, ny, cells=CHUNK_CELLS):
+    """Chunk ``(cx, cy)`` of an ``nx`` by ``ny`` chunk world with ``seed``."""
+
+    # string seeds hash the same in every process
+    rng = random.Random(f"{seed}:{cx}:{cy}")
+    size = cells * GRID
+    ox, oy = cx * size, cy * size
+    walls = []
+    # the world border, cut to this chunk
+    if cx == 0:
+        walls.append(pygame.Rect(ox, oy, BORDER, size))
+    if cx == nx - 1:
+        walls.append(pygame.Rect(ox + size - BORDER, oy, BORDER, size))
+    if cy == 0:
+        walls.append(pygame.Rect(ox, oy, size, BORDER))
+    if cy == ny - 1:
+        walls.append(pygame.Rect(ox, oy + size - BORDER, size, BORDER))
+    # corridors and rooms out of straight wall segments, clear of the chunk
+    # border so neighbouring chunks stay connected
+    margin = RADIUS + 2 * GRID
+    lo, hi = margin, size - margin
+    for _ in range(rng.randint(4, 10)):
+        length = rng.randint(4, cells // 2) * GRID
+        if rng.random() < 0.5:
+            w, h = min(length, hi - lo), WALL_THICKNESS
+        else:
+            w, h = WALL_THICKNESS, min(length, hi - lo)
+        x = rng.randint(lo, hi - w); y = rng.randint(lo, hi - h)
+        walls.append(pygame.Rect(ox + x, oy + y, w, h))
+        if rng.random() < 0.3:
+            # turn the segment into an L
+            if w > h:
+                walls.append(pygame.Rect(ox + x, oy + y, WALL_THICKNESS, min(w, hi - y)))
+            else:
+                walls.append(pygame.Rect(ox + x, oy + y, min(h, hi - x), WALL_THICKNESS))
+    walls = WallIndex(walls)
+
+    tiles = build_grid_array([w.move(-ox, -oy) for w in walls], cells, cells)
+    # cover: walkable cells with a blocked 4-neighbour inside the chunk
+    blocked = ~tiles
+    edge = np.zeros_like(tiles)
+    edge[1:, :] |= blocked[:-1, :]; edge[:-1, :] |= blocked[1:, :]
+    edge[:, 1:] |= blocked[:, :-1]; edge[:, :-1] |= blocked[:, 1:]
+    cover = np.argwhere(tiles & edge) + (cx * cells, cy * cells)
+    # site: the cell with the most room around it
+    dist2 = squared_edt(np.pad(blocked, 1, constant_values=True))[1:-1, 1:-1]
+    c, r = np.unravel_index(int(np.argmax(dist2)), dist2.shape)
+    site = ((cx * cells + int(c), cy * cells + int(r)), float(np.sqrt(dist2[c, r])))
+    return Chunk(cx, cy, walls, tiles, cover, site)
+
+
+class ChunkWorld:
+    """A procedurally generated world of ``chunks`` chunks, made on demand."""
+
+    def __init__(self, seed=0, chunks=(PROC_CHUNKS, PROC_CHUNKS), chunk_cells=CHUNK_CELLS,
+                 max_resident=CHUNK_CACHE, site_chunks=PROC_SITE_CHUNKS):
+        self.seed = seed
+        self.nx, self.ny = chunks
+        self.site_chunks = site_chunks
+        self.cells = chunk_cells
+        self.size = chunk_cells * GRID
+        self.cols, self.rows = self.nx * chunk_cells, self.ny * chunk_cells
+        self.width, self.height = self.cols * GRID, self.rows * GRID
+        self.max_resident = max_resident
+        self.resident = OrderedDict()
+        self.generated = 0
+        self.walls = ChunkWalls(self)
+        self.grid = ChunkGrid(self)
+        self._sites = None
+
+    def chunk(self, cx, cy):
+        """Chunk ``(cx, cy)``, generated if it is not resident."""
+
+        key = (cx, cy)
+        chunk = self.resident.get(key)
+        if chunk is None:
+            if not (0 <= cx < self.nx and 0 <= cy < self.ny):
+                raise IndexError(f"chunk {key} outside the world")
+            chunk = self.resident[key] = generate_chunk(self.seed, cx, cy, self.nx, self.ny, self.cells)
+            self.generated += 1
+            PROFILER.count("chunks.generated")
+            while len(self.resident) > self.max_resident:
+                self.resident.popitem(last=False)
+        else:
+            self.resident.move_to_end(key)
+        return chunk
+
+    def index(self, cx, cy):
+        return cy * self.nx + cx
+
+    def chunks_in(self, x0, y0, x1, y1):
+        """Chunk coordinates overlapping the closed box, in index order."""
+
+        s = self.size
+        cx0 = max(0, int(x0 // s)); cx1 = min(self.nx - 1, int(x1 // s))
+        cy0 = max(0, int(y0 // s)); cy1 = min(self.ny - 1, int(y1 // s))
+        return [(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)]
+
+    def cell_of(self, x, y):
+        """Grid cell of world position ``(x, y)``, clamped to the world."""
+
+        return (min(max(int(x // GRID), 0), self.cols - 1),
+                min(max(int(y // GRID), 0), self.rows - 1))
+
+    def passable(self, c, r):
+        cells = self.cells
+        return bool(self.chunk(c // cells, r // cells).tiles[c % cells, r % cells])
+
+    def cover_near(self, x, y, radius):
+        """Cover cells whose centre lies within ``radius`` pixels of ``(x, y)``."""
+
+        found = []
+        for cx, cy in self.chunks_in(x - radius, y - radius, x + radius, y + radius):
+            cover = self.chunk(cx, cy).cover
+            if len(cover):
+                px = cover[:, 0] * GRID + GRID // 2 - x
+                py = cover[:, 1] * GRID + GRID // 2 - y
+                found.extend(map(tuple, cover[px * px + py * py <= radius * radius].tolist()))
+        return found
+
+    @property
+    def sites(self):
+        """Bomb sites ``{"A": cell, "B": cell}``.
+
+        The sites lie in two opposite quarters of a window of at most
+        ``site_chunks`` chunks on a side, placed at random in larger worlds.
+        """
+
+        if self._sites is None:
+            rng = random.Random(f"{self.seed}:sites")
+            wx, wy = min(self.nx, self.site_chunks), min(self.ny, self.site_chunks)
+            ox = rng.randrange(self.nx - wx + 1) if wx < self.nx else 0
+            oy = rng.randrange(self.ny - wy + 1) if wy < self.ny else 0
+            hx, hy = max(1, wx // 2), max(1, wy // 2)
+            a = (ox + rng.randrange(hx), oy + rng.randrange(hy))
+            b = (ox + wx - 1 - rng.randrange(hx), oy + wy - 1 - rng.randrange(hy))
+            self._sites = {"A": self.chunk(*a).site[0], "B": self.chunk(*b).site[0]}
+        return self._sites
+
+
+class ChunkWalls:
+    """:class:`spatial.WallIndex` queries over the walls of a :class:`ChunkWorld`."""
+
+    chunked = True
+
+    def __init__(self, world):
+        self.world = world
+        self.bounds = (world.width, world.height)
+
+    def __getitem__(self, i):
+        q, k = divmod(i, WALL_STRIDE)
+        cy, cx = divmod(q, self.world.nx)
+        return self.world.chunk(cx, cy).walls[k]
+
+    def __iter__(self):
+        raise TypeError("chunked walls cannot be iterated; query a region instead")
+
+    def _gather(self, x0, y0, x1, y1, query):
+        world = self.world
+        out = []
+        for cx, cy in world.chunks_in(x0, y0, x1, y1):
+            base = world.index(cx, cy) * WALL_STRIDE
+            out.extend(base + k for k in query(world.chunk(cx, cy).walls))
+        return out
+
+    def box_indices(self, x0, y0, x1, y1):
+        return self._gather(x0, y0, x1, y1, lambda w: w.box_indices(x0, y0, x1, y1))
+
+    def circle_indices(self, x, y, r):
+        return self.box_indices(x - r, y - r, x + r, y + r)
+
+    def point_indices(self, x, y):
+        return self._gather(x, y, x, y, lambda w: w.point_indices(x, y))
+
+    def segment_indices(self, p1, p2):
+        (x1, y1), (x2, y2) = p1, p2
+        return self._gather(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2),
+                            lambda w: w.segment_indices(p1, p2))
+
+    def near_circle(self, x, y, r):
+        return [self[i] for i in self.circle_indices(x, y, r)]
+
+    def near_point(self, x, y):
+        return [self[i] for i in self.point_indices(x, y)]
+
+    def near_segment(self, p1, p2):
+        return [self[i] for i in self.segment_indices(p1, p2)]
+
+    def sight(self):
+        """Line of sight engine for :func:`los.engine_for`."""
+
+        return ChunkSight(self)
+
+
+class ChunkSight:
+    """:class:`los.LineOfSight` counterpart testing only the chunks a line crosses."""
+
+    def __init__(self, walls):
+        self.source = walls
+        self.world = walls.world
+
+    def _clear(self, p1, p2):
+        world = self.world
+        (x1, y1), (x2, y2) = p1, p2
+        for cx, cy in world.chunks_in(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+            chunk = world.chunk(cx, cy)
+            edges = chunk.wall_edges()
+            for i in chunk.walls.segment_indices(p1, p2):
+                for e1, e2 in edges[i]:
+                    if seg_intersect(p1, p2, e1, e2):
+                        return False
+        return True
+
+    def clear(self, p1, p2):
+        PROFILER.count("los.queries")
+        return self._clear(p1, p2)
+
+    def clear_many(self, starts, ends):
+        PROFILER.count("los.queries", len(starts))
+        return np.array([self._clear(tuple(a), tuple(b)) for a, b in zip(starts, ends)], dtype=bool)
+
+
+class _ChunkColumn:
+    __slots__ = ("world", "c")
+
+    def __init__(self, world, c):
+        self.world = world
+        self.c = c
+
+    def __len__(self):
+        return self.world.rows
+
+    def __getitem__(self, r):
+        return self.world.passable(self.c, r)
+
+
+class ChunkGrid:
+    """Walkability of a :class:`ChunkWorld` indexed ``grid[col][row]``."""
+
+    chunked = True
+
+    def __init__(self, world):
+        self.world = world
+        self.bounds = (world.width, world.height)
+
+    def cell_of(self, x, y):
+        return self.world.cell_of(x, y)
+
+    @property
+    def sites(self):
+        return self.world.sites
+
+    def __len__(self):
+        return self.world.cols
+
+    def __getitem__(self, c):
+        return _ChunkColumn(self.world, c)
+
+    def nearest_passable(self, cell, max_ring=NEAREST_RING):
+        """Same search as :func:`map.nearest_passable_cell` within the world's bounds."""
+
+        world = self.world
+        cx, cy = cell
+        if world.passable(cx, cy):
+            return (cx, cy)
+        for dx, dy in ring_offsets(max_ring):
+            x = cx + dx; y = cy + dy
+            if 0 <= x < world.cols and 0 <= y < world.rows and world.passable(x, y):
+                return (x, y)
+        return (cx, cy)
@@ -0,0 +1,154 @@
+"""Clearance map and nearest passable cell table of a walkability grid.
+
+Picking a bomb zone used to rejection-sample random cells and test a whole
+disk of cells around each candidate, and every goal lookup of a bot walked
+rings of cells in :func:`map.nearest_passable_cell`.  :class:`Clearance`
+precomputes both once per grid:
+
+* ``dist2`` holds for every cell the squared Euclidean distance, in cells, to
+  the nearest blocked cell, counting everything outside the grid as blocked.
+  A cell is a valid zone centre for radius ``r`` exactly when every cell of
+  the disk around it is walkable, i.e. when ``dist2 > r * r``; the valid
+  centres per radius are listed once and sampled with a single draw.
+  ``clearance`` (the distance itself) is there for path costs that want to
+  keep away from walls.
+* ``nearest`` holds for every cell the cell :func:`map.nearest_passable_cell`
+  would return, found in the same ring order, so snapping a goal is one
+  array read.
+
+Both arrays are stored in the :mod:`worldcache` under the grid's key, so
+only the first process that sees a grid pays for them.  The grid is treated
+as static; build a new table when it changes.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from config import COLS, ROWS
+from worldcache import default_cache, grid_key
+
+# rings searched for the nearest passable cell, as in map.nearest_passable_cell
+NEAREST_RING = 20
+
+
+def squared_edt(blocked):
+    """Squared Euclidean distance from every cell to the nearest ``True`` cell.
+
+    Exact, computed separably: distances along the second axis first, then
+    the minimum over the first axis.  Cells with no blocked cell anywhere get
+    a value larger than any distance within the array.
+    """
+
+    n, m = blocked.shape
+    big = n + m
+    idx = np.arange(m)
+    prev = np.maximum.accumulate(np.where(blocked, idx, -big), axis=1)
+    nxt = np.minimum.accumulate(np.where(blocked, idx, 2 * big)[:, ::-1], axis=1)[:, ::-1]
+    g2 = np.minimum(idx - prev, nxt - idx).astype(np.int64) ** 2
+    xs = np.arange(n)
+    dx2 = (xs[:, None] - xs[None, :]) ** 2
+    out = np.empty((n, m), dtype=np.int64)
+    for x in range(n):
+        out[x] = (dx2[x][:, None] + g2).min(axis=0)
+    return out
+
+
+@lru_cache(maxsize=4)
+def ring_offsets(max_ring=NEAREST_RING):
+    """Cell offsets in the order :func:`map.nearest_passable_cell` visits them."""
+
+    out = []
+    for r in range(1, max_ring + 1):
+        for dx in range(-r, r + 1):
+            for dy in (-r, r):
+                out.append((dx, dy))
+        for dy in range(-r + 1, r):
+            for dx in (-r, r):
+                out.append((dx, dy))
+    return tuple(out)
+
+
+class Clearance:
+    """Distance to walls and nearest passable cells of one grid."""
+
+    def __init__(self, grid, cache=None):
+        self.grid = grid
+        walk = np.asarray(grid, dtype=bool)
+        cache = cache or default_cache()
+        key = grid_key(walk)
+        self.dist2 = cache.get_or_build(key, "clearance_dist2", lambda: self._dist2(walk))
+        self.clearance = np.sqrt(self.dist2)
+        self.nearest = cache.get_or_build(key, "nearest_passable", lambda: self._nearest_table(walk))
+        self.centres = {}
+
+    @staticmethod
+    def _dist2(walk):
+        cols, rows = walk.shape
+        # one ring of blocked cells around the grid stands in for the outside
+        blocked = np.ones((cols + 2, rows + 2), dtype=bool)
+        blocked[1:-1, 1:-1] = ~walk
+        return squared_edt(blocked)[1:-1, 1:-1]
+
+    @staticmethod
+    def _nearest_table(walk):
+        cols, rows = walk.shape
+        cs, rs = np.meshgrid(np.arange(cols), np.arange(rows), indexing="ij")
+        table = np.stack((cs, rs), axis=-1).astype(np.int32)
+        todo_c, todo_r = np.nonzero(~walk)
+        # cells that find nothing within the rings keep their own position
+        for dx, dy in ring_offsets():
+            if not len(todo_c):
+                break
+            x = todo_c + dx; y = todo_r + dy
+            ok = (0 <= x) & (x < COLS) & (0 <= y) & (y < ROWS) & (x < cols) & (y < rows)
+            ok[ok] = walk[x[ok], y[ok]]
+            table[todo_c[ok], todo_r[ok], 0] = x[ok]
+            table[todo_c[ok], todo_r[ok], 1] = y[ok]
+            todo_c = todo_c[~ok]; todo_r = todo_r[~ok]
+        return table
+
+    def nearest_passable(self, cell):
+        c, r = self.nearest[cell[0], cell[1]]
+        return (int(c), int(r))
+
+    def zone_centres(self, radius):
+        """Cells whose disk of ``radius`` cells is inside the grid and walkable."""
+
+        centres = self.centres.get(radius)
+        if centres is None:
+            centres = self.centres[radius] = np.argwhere(self.dist2 > radius * radius)
+        return centres
+
+    def random_centre(self, radius, rng):
+        """A uniformly drawn valid zone centre, or ``None`` if there is none."""
+
+        centres = self.zone_centres(radius)
+        if not len(centres):
+            return None
+        c, r = centres[rng.randrange(len(centres))]
+        return (int(c), int(r))
+
+
+_clearance = None
+
+
+def clearance_for(grid):
+    """Shared :class:`Clearance` for ``grid``, rebuilt when the grid changes."""
+
+    global _clearance
+    if getattr(grid, "chunked", False):
+        # copying a chunked world into arrays would generate all of it
+        raise TypeError("chunked grids have no clearance map")
+    table = _clearance
+    if table is None or table.grid is not grid:
+        table = _clearance = Clearance(grid)
+    return table
+
+
+def cells_changed(grid, cells):
+    """Drop the shared table after ``cells`` of ``grid`` changed in place."""
+
+    global _clearance
+    if _clearance is not None and _clearance.grid is grid:
+        _clearance = None
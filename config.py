@@ -7,6 +7,8 @@ implemented in this kata, the large list mainly mirrors the specification in
 the user prompt.
 """
 
+import os
+
 # --- World ---------------------------------------------------------------
 
 # The playable world is intentionally huge.  A camera/viewport will follow the
@@ -15,7 +17,35 @@ WIDTH, HEIGHT = 9000, 9000
 VIEW_W, VIEW_H = 1280, 720
 GRID = 32
 COLS, ROWS = WIDTH // GRID, HEIGHT // GRID
+# Simulation ticks per second.  Logic always advances in fixed ticks of
+# TICK_MS and movement speeds below are per tick; the display renders at
+# RENDER_FPS and interpolates between ticks.  After a stall at most
+# MAX_TICKS_PER_FRAME ticks are run to catch up before time is dropped.
 FPS = 60
+TICK_MS = 1000 / FPS
+RENDER_FPS = 60
+MAX_TICKS_PER_FRAME = 5
+
+# Costly world artifacts derived from the grid are cached on disk.
+WORLD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "valor", "worlds")
+WORLD_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Side of the spatial hash buckets walls are indexed in for collision queries.
+WALL_BUCKET = 256
+# Side of the per tick grid agents are bucketed in for neighbour queries.
+AGENT_CELL = 64
+# Procedural worlds are generated in square chunks of CHUNK_CELLS grid cells,
+# PROC_CHUNKS chunks on a side by default; at most CHUNK_CACHE chunks are kept
+# in memory at a time.  Both bomb sites lie within a square of PROC_SITE_CHUNKS
+# chunks, so a round stays playable however large the world is.
+CHUNK_CELLS = 64
+PROC_CHUNKS = 32
+PROC_SITE_CHUNKS = 4
+CHUNK_CACHE = 64
+
+# Bots per team.  Rounds scale up to 256v256; larger teams spawn on a lattice
+# fanning out from each team's corner, SPAWN_SPACING pixels apart.
+TEAM_SIZE = 4
+SPAWN_SPACING = 60
 
 # --- Movement -----------------------------------------------------------
 
@@ -29,10 +59,41 @@ SEP_STRENGTH = 1.1
 STUCK_MS = 600
 RESERVE_MS = 200
 
+# Path finding engine used by bot_ai: "astar" plans per bot, "flowfield"
+# shares one field per goal cell between all bots heading there and "jps"
+# plans 8-connected smoothed paths with Jump Point Search.  "hpa" searches a
+# cluster graph first and only refines the clusters along the route and
+# "dstar" repairs a per bot search tree instead of replanning from scratch.
+NAV_MODE = "astar"
+HPA_CLUSTER = 16
+# The per bot incremental planner restarts once its goal has drifted this many
+# cells in total; the accumulated offset makes every later search less focused.
+DSTAR_MAX_DRIFT = 2_000
+FLOW_FIELD_TTL_MS = 2_000
+
+# --- Bot AI -------------------------------------------------------------
+
+# Bots decide (target, route, revive) every AI_THINK_TICKS ticks, staggered
+# across ticks, and steer on every tick.  Bots farther than AI_LOD_DIST from
+# every enemy and the bomb zone decide AI_LOD_FACTOR times less often.  The
+# interactive game spends at most AI_BUDGET_MS per tick on decisions; at most
+# AI_MAX_THINKS bots decide per tick.
+AI_THINK_TICKS = 6
+AI_LOD_DIST = 1800
+AI_LOD_FACTOR = 4
+AI_BUDGET_MS = 4.0
+AI_MAX_THINKS = 64
+# Worker processes planning bot paths in the background in the interactive
+# game (see pathpool.py).
+PATH_WORKERS = 2
+
 # --- Combat -------------------------------------------------------------
 
 BULLET_SPEED = 7.5
 BULLET_RADIUS = 5
+# Bullet/wall batches with at most this many combinations are tested densely;
+# larger ones look up the walls near each bullet in the spatial hash.
+BULLET_DENSE_TESTS = 1 << 16
 
 MAX_HP = 100
 LOW_HP_THRESH = 28
@@ -86,6 +147,38 @@ UTILS = {
 
 MINIMAP_SIZE = 260
 ENEMY_MEMORY_MS = 2_000
+# Agent dots are redrawn at most this often; remembered enemies fade in steps
+# of MINIMAP_ALPHA_STEP so their dot sprites can be cached.
+MINIMAP_REFRESH_MS = 50
+MINIMAP_ALPHA_STEP = 16
+
+# --- Rendering ----------------------------------------------------------
+
+# The static background is drawn in BG_TILE px tiles, at most BG_TILE_CACHE of
+# them kept around; grid lines are BG_LINE_STEP px apart.
+BG_TILE = 512
+BG_TILE_CACHE = 48
+BG_LINE_STEP = 48
+# UI font and the number of rendered strings kept in the text cache.
+FONT_NAME = "consolas"
+TEXT_CACHE_SIZE = 512
+
+# --- Profiling ----------------------------------------------------------
+
+# F3 toggles the profiler and its overlay, F4 writes a Chrome trace of the
+# recorded frames to PROFILE_TRACE_PATH.  The overlay averages over
+# PROFILE_WINDOW frames, redrawn every PROFILE_OVERLAY_MS; at most
+# PROFILE_MAX_EVENTS scopes are kept for the trace.
+PROFILE_WINDOW = 60
+PROFILE_MAX_EVENTS = 200_000
+PROFILE_OVERLAY_MS = 250
+PROFILE_TRACE_PATH = "valor_trace.json"
+
+# --- Replays ------------------------------------------------------------
+
+# A recorded round stores a checksum of the simulation state every
+# REPLAY_CHECKSUM_TICKS ticks; replays compare against it to detect divergence.
+REPLAY_CHECKSUM_TICKS = 60
 
 # --- Colours ------------------------------------------------------------
 
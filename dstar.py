@@ -0,0 +1,253 @@
+"""Incremental path planning kept per bot (Moving Target D* Lite).
+
+``bot_ai`` used to throw its path away and run :func:`ai.astar` from scratch
+whenever the goal changed or 300 ms passed.  :class:`IncrementalPlanner` keeps
+its search tree between replans instead:
+
+* The search runs forwards from the bot, so when the goal moves (a defender
+  chasing ``last_known_enemy``) every distance already computed stays valid.
+  Only the heuristic changes, which is absorbed by the ``km`` key offset as in
+  D* Lite, and the search resumes where it stopped.
+* While the bot walks along its path the tree keeps its root and the path is
+  simply cut at the bot's cell.  Once the bot has left the path, the part of
+  the tree hanging below its new cell is kept and only the rest is discarded
+  and repaired.
+* When grid cells change, :meth:`IncrementalPlanner.update_cells` re-evaluates
+  just those cells and their neighbours; the search then repairs the affected
+  part of the tree.
+
+Moves are 4-connected with unit cost like :func:`ai.astar`, so paths have the
+same length.
+"""
+
+import heapq
+
+from config import DSTAR_MAX_DRIFT
+
+INF = float("inf")
+
+
+class IncrementalPlanner:
+    """Moving Target D* Lite search on ``grid[col][row]``."""
+
+    def __init__(self, grid, start, goal):
+        self.grid = grid
+        self.cols = len(grid)
+        self.rows = len(grid[0])
+        self.expanded = 0
+        self.reset(start, goal)
+
+    def reset(self, start, goal):
+        """Forget everything and search from scratch."""
+
+        self.start = start
+        self.goal = goal
+        self.km = 0
+        self.g = {}
+        self.rhs = {start: 0}
+        self.parent = {start: None}
+        self.open = []
+        self.open_key = {}
+        self._push(start)
+
+    # ------------------------------------------------------------------
+    # helpers
+    # ------------------------------------------------------------------
+
+    def _h(self, s):
+        return abs(s[0] - self.goal[0]) + abs(s[1] - self.goal[1])
+
+    def _key(self, s):
+        v = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (v + self._h(s) + self.km, v)
+
+    def _push(self, s):
+        k = self._key(s)
+        self.open_key[s] = k
+        heapq.heappush(self.open, (k, s))
+
+    def _remove(self, s):
+        self.open_key.pop(s, None)
+
+    def _top(self):
+        """Smallest valid open entry, dropping stale heap entries."""
+
+        openh = self.open
+        while openh:
+            k, s = openh[0]
+            if self.open_key.get(s) == k:
+                return k, s
+            heapq.heappop(openh)
+        return None
+
+    def _passable(self, s):
+        x, y = s
+        return s == self.start or (0 <= x < self.cols and 0 <= y < self.rows and self.grid[x][y])
+
+    def _neighbours(self, s):
+        x, y = s
+        for nb in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nb[0] < self.cols and 0 <= nb[1] < self.rows:
+                yield nb
+
+    def _refresh(self, s):
+        """Put ``s`` in the open list exactly when it is inconsistent."""
+
+        self._remove(s)
+        if self.g.get(s, INF) != self.rhs.get(s, INF):
+            self._push(s)
+
+    def _recompute_rhs(self, s):
+        """Best one-step lookahead value of ``s`` from its neighbours."""
+
+        if s == self.start:
+            return
+        best = INF; best_p = None
+        if self._passable(s):
+            g = self.g
+            for p in self._neighbours(s):
+                if self._passable(p):
+                    v = g.get(p, INF) + 1
+                    if v < best:
+                        best = v; best_p = p
+        if best == INF:
+            self.rhs.pop(s, None)
+            self.parent.pop(s, None)
+        else:
+            self.rhs[s] = best
+            self.parent[s] = best_p
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+
+    def compute(self):
+        g = self.g; rhs = self.rhs; parent = self.parent
+        goal = self.goal
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            k_old, u = top
+            if not (k_old < self._key(goal) or rhs.get(goal, INF) != g.get(goal, INF)):
+                break
+            k_new = self._key(u)
+            if k_old < k_new:
+                self._push(u)
+                continue
+            heapq.heappop(self.open)
+            del self.open_key[u]
+            self.expanded += 1
+            gu = g.get(u, INF); ru = rhs.get(u, INF)
+            if gu > ru:
+                g[u] = ru
+                v = ru + 1
+                if self._passable(u):
+                    for s in self._neighbours(u):
+                        if s != self.start and self._passable(s) and rhs.get(s, INF) > v:
+                            rhs[s] = v; parent[s] = u
+                            self._refresh(s)
+            else:
+                g.pop(u, None)
+                for s in list(self._neighbours(u)) + [u]:
+                    if s != self.start and parent.get(s) == u:
+                        self._recompute_rhs(s)
+                    self._refresh(s)
+
+    def path(self):
+        """Cells from start to goal following the search tree, or ``None``."""
+
+        goal = self.goal
+        if self.g.get(goal, INF) == INF and self.rhs.get(goal, INF) == INF:
+            return None
+        out = []
+        cur = goal
+        limit = len(self.parent) + 1
+        while cur is not None and limit:
+            out.append(cur)
+            cur = self.parent.get(cur)
+            limit -= 1
+        if out[-1] != self.start:
+            return None
+        out.reverse()
+        return out
+
+    # ------------------------------------------------------------------
+    # changes
+    # ------------------------------------------------------------------
+
+    def move_goal(self, goal):
+        if goal == self.goal:
+            return
+        self.km += abs(goal[0] - self.goal[0]) + abs(goal[1] - self.goal[1])
+        self.goal = goal
+
+    def move_start(self, start):
+        """Re-root the search at ``start`` keeping the subtree below it."""
+
+        old = self.start
+        if start == old:
+            return
+        g = self.g; rhs = self.rhs; parent = self.parent
+        gs = g.get(start, INF)
+        if gs == INF or gs != rhs.get(start, INF):
+            self.reset(start, self.goal)
+            return
+
+        # nodes whose tree path to the old start runs through the new one
+        # (parents of cells still waiting in the open list may form cycles)
+        keep = {start: True}
+        def in_subtree(s):
+            trail = []
+            on_trail = set()
+            while s is not None and s not in keep and s not in on_trail:
+                trail.append(s); on_trail.add(s)
+                s = parent.get(s)
+            res = keep.get(s, False)
+            for t in trail:
+                keep[t] = res
+            return res
+
+        dropped = [s for s in list(parent) if not in_subtree(s)]
+        dropped += [s for s in list(g) if s not in parent and s not in keep]
+        self.start = start
+        parent[start] = None
+        for s in dropped:
+            g.pop(s, None); rhs.pop(s, None); parent.pop(s, None)
+            self._remove(s)
+        # keep the old values of the retained subtree: they are all offset by
+        # the same amount, g(start), so their order is still right
+        for s in dropped:
+            self._recompute_rhs(s)
+            self._refresh(s)
+
+    def update_cells(self, cells):
+        """Re-evaluate ``cells`` after their walkability changed in the grid."""
+
+        for c in cells:
+            for s in list(self._neighbours(c)) + [c]:
+                self._recompute_rhs(s)
+                self._refresh(s)
+
+    def replan(self, start, goal):
+        """Move start and goal as needed and return the repaired path.
+
+        The root is only moved when the bot has left the current path: a
+        suffix of a shortest path is itself a shortest path, so while the bot
+        walks along it the tree can stay rooted where it is.
+        """
+
+        if self.km > DSTAR_MAX_DRIFT:
+            self.reset(self.start, goal)
+        else:
+            self.move_goal(goal)
+        if not self._passable(goal):
+            return None
+        if start != self.start:
+            self.compute()
+            path = self.path()
+            if path and start in path:
+                return path[path.index(start):]
+            self.move_start(start)
+        self.compute()
+        return self.path()
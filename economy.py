@@ -8,9 +8,9 @@ functions manipulate ``Agent`` instances.
 """
 
 from typing import Iterable
-import pygame
 
 from config import WEAPONS, ARMORS, UTILS
+from gameclock import get_ticks
 
 
 def start_buy_phase(agents: Iterable, team: str, duration_ms: int = 9000) -> int:
@@ -19,7 +19,7 @@ def start_buy_phase(agents: Iterable, team: str, duration_ms: int = 9000) -> int
     Returns the timestamp when the phase ends.
     """
 
-    end_time = pygame.time.get_ticks() + duration_ms
+    end_time = get_ticks() + duration_ms
     for a in agents:
         a.buy_time_end = end_time
     return end_time
@@ -36,7 +36,7 @@ def _price_of(item_name: str) -> int:
 
 
 def can_buy(agent, item_name: str) -> bool:
-    now = pygame.time.get_ticks()
+    now = get_ticks()
     price = _price_of(item_name)
     return getattr(agent, "buy_time_end", 0) > now and agent.credits >= price
 
@@ -1,4 +1,5 @@
 import pygame, math
+import numpy as np
 
 from config import (
     RADIUS,
@@ -11,8 +12,11 @@ from config import (
     HEIGHT,
     GRID,
     WEAPONS,
+    BULLET_DENSE_TESTS,
 )
 from map import move_with_collision
+from gameclock import get_ticks
+from text import render_text
 
 WHITE=(255,255,255)
 GREEN=(70,200,100)
@@ -32,6 +36,162 @@ class Bullet:
         self.team = team
         self.dmg = dmg
         self.dead = False
+    def update(self,walls):
+        self.x+=self.vx; self.y+=self.vy
+        if not (0<=self.x<=WIDTH and 0<=self.y<=HEIGHT):
+            self.dead=True; return
+        near=getattr(walls,'near_point',None)
+        for rect in (near(self.x,self.y) if near else walls):
+            if rect.collidepoint(self.x,self.y):
+                self.dead=True; return
+    def draw(self,surf,cam):
+        pygame.draw.circle(surf,WHITE,(int(self.x-cam[0]),int(self.y-cam[1])),BULLET_RADIUS)
+
+
+TEAM_IDS = {"ATT": 0, "DEF": 1}
+
+
+class BulletPool:
+    """All live bullets of a round as parallel NumPy arrays.
+
+    Slots of dead bullets go back on a free list and the arrays double in size
+    when it runs dry, so firing does not allocate per shot.  :meth:`update`
+    moves every bullet, culls the ones that left the world or entered a wall
+    and finds the first enemy each remaining bullet touches, all as array
+    operations.  Hits are reported in firing order, which is the order the old
+    per-bullet loop applied damage in.
+    """
+
+    def __init__(self, capacity=256):
+        self.x = np.zeros(capacity); self.y = np.zeros(capacity)
+        self.px = np.zeros(capacity); self.py = np.zeros(capacity)
+        self.vx = np.zeros(capacity); self.vy = np.zeros(capacity)
+        self.team = np.zeros(capacity, dtype=np.int8)
+        self.dmg = np.zeros(capacity, dtype=np.int32)
+        self.seq = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.next_seq = 0
+        self.walls = None
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def _grow(self):
+        n = len(self.alive)
+        for name in ("x", "y", "px", "py", "vx", "vy", "team", "dmg", "seq", "alive"):
+            old = getattr(self, name)
+            new = np.zeros(n * 2, dtype=old.dtype)
+            new[:n] = old
+            setattr(self, name, new)
+        self.free = list(range(n * 2 - 1, n - 1, -1))
+
+    def spawn(self, x, y, vx, vy, team, dmg):
+        if not self.free:
+            self._grow()
+        i = self.free.pop()
+        self.x[i] = self.px[i] = x; self.y[i] = self.py[i] = y
+        self.vx[i] = vx; self.vy[i] = vy
+        self.team[i] = TEAM_IDS[team]; self.dmg[i] = dmg
+        self.seq[i] = self.next_seq; self.next_seq += 1
+        self.alive[i] = True
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = list(range(len(self.alive) - 1, -1, -1))
+
+    def _bind(self, walls):
+        # wall rects as arrays for the point-in-rect test
+        if walls is not self.walls:
+            self.walls = walls
+            self.bounds = getattr(walls, "bounds", (WIDTH, HEIGHT))
+            if getattr(walls, "chunked", False):
+                # generated on demand: ask per bullet instead of copying
+                self.wx0 = None
+                return
+            r = np.array([tuple(w) for w in walls], dtype=np.int64).reshape(-1, 4)
+            self.wx0 = r[:, 0]; self.wy0 = r[:, 1]
+            self.wx1 = r[:, 0] + r[:, 2]; self.wy1 = r[:, 1] + r[:, 3]
+
+    def _in_walls(self, x, y):
+        """Rows of ``(x, y)`` inside a wall (``Rect.collidepoint`` semantics)."""
+
+        # collidepoint truncates coordinates to integers
+        xi = np.trunc(x); yi = np.trunc(y)
+        if self.wx0 is None:
+            walls = self.walls
+            return np.array([any(r.collidepoint(x[k], y[k]) for r in walls.near_point(x[k], y[k]))
+                             for k in range(len(x))], dtype=bool)
+        if len(x) * len(self.wx0) <= BULLET_DENSE_TESTS:
+            inside = ((self.wx0 <= xi[:, None]) & (xi[:, None] < self.wx1)
+                      & (self.wy0 <= yi[:, None]) & (yi[:, None] < self.wy1))
+            return inside.any(axis=1)
+        near = getattr(self.walls, "point_indices", None)
+        out = np.zeros(len(x), dtype=bool)
+        for k in range(len(x)):
+            idx = near(x[k], y[k]) if near else range(len(self.wx0))
+            for w in idx:
+                if self.wx0[w] <= xi[k] < self.wx1[w] and self.wy0[w] <= yi[k] < self.wy1[w]:
+                    out[k] = True; break
+        return out
+
+    def update(self, walls, agents):
+        """Advance all bullets one tick.
+
+        Returns ``(bullet_team, agent, dmg)`` for every bullet that hit an
+        enemy agent (alive or downed), in firing order.  Those bullets are
+        removed; applying the damage is left to the caller.
+        """
+
+        self._bind(walls)
+        live = np.nonzero(self.alive)[0]
+        if not len(live):
+            return []
+        self.px[live] = self.x[live]; self.py[live] = self.y[live]
+        x = self.x[live] + self.vx[live]; y = self.y[live] + self.vy[live]
+        self.x[live] = x; self.y[live] = y
+        w, h = self.bounds
+        gone = ~((0 <= x) & (x <= w) & (0 <= y) & (y <= h))
+        keep = np.nonzero(~gone)[0]
+        if len(keep) and (self.wx0 is None or len(self.wx0)):
+            gone[keep[self._in_walls(x[keep], y[keep])]] = True
+
+        hits = []
+        targets = [a for a in agents if a.alive or a.downed]
+        ok = np.nonzero(~gone)[0]
+        if targets and len(ok):
+            tx = np.array([a.x for a in targets], dtype=float)
+            ty = np.array([a.y for a in targets], dtype=float)
+            tteam = np.array([TEAM_IDS[a.team] for a in targets], dtype=np.int8)
+            dx = x[ok, None] - tx; dy = y[ok, None] - ty
+            touch = (np.sqrt(dx * dx + dy * dy) <= RADIUS + BULLET_RADIUS)
+            touch &= self.team[live[ok], None] != tteam
+            hit_rows = np.nonzero(touch.any(axis=1))[0]
+            if len(hit_rows):
+                first = touch[hit_rows].argmax(axis=1)
+                slots = live[ok[hit_rows]]
+                order = np.argsort(self.seq[slots], kind="stable")
+                teams = {v: k for k, v in TEAM_IDS.items()}
+                for o in order:
+                    s = slots[o]
+                    hits.append((teams[int(self.team[s])], targets[first[o]], int(self.dmg[s])))
+                gone[ok[hit_rows]] = True
+
+        dead = live[gone]
+        self.alive[dead] = False
+        self.free.extend(dead.tolist())
+        return hits
+
+    def draw(self, surf, cam, alpha=1.0):
+        live = np.nonzero(self.alive)[0]
+        px = self.px[live]; py = self.py[live]
+        sx = px + (self.x[live] - px) * alpha - cam[0]
+        sy = py + (self.y[live] - py) * alpha - cam[1]
+        w, h = surf.get_size()
+        m = BULLET_RADIUS
+        on = (sx >= -m) & (sx <= w + m) & (sy >= -m) & (sy <= h + m)
+        for px, py in zip(sx[on].astype(int), sy[on].astype(int)):
+            pygame.draw.circle(surf, WHITE, (int(px), int(py)), BULLET_RADIUS)
 
 
 class Weapon:
@@ -44,21 +204,14 @@ class Weapon:
         self.dmg = data["dmg"]
         self.rof_ms = data.get("rof_ms", 200)
         self.mag = data.get("mag", 0)
-    def update(self,walls):
-        self.x+=self.vx; self.y+=self.vy
-        if not (0<=self.x<=WIDTH and 0<=self.y<=HEIGHT):
-            self.dead=True; return
-        for rect in walls:
-            if rect.collidepoint(self.x,self.y):
-                self.dead=True; return
-    def draw(self,surf,cam):
-        pygame.draw.circle(surf,WHITE,(int(self.x-cam[0]),int(self.y-cam[1])),BULLET_RADIUS)
 
 class Agent:
     """Player or bot controlled character."""
 
     def __init__(self, x, y, color, team, is_player=False, name=""):
         self.x, self.y = x, y
+        # position at the start of the current tick, for interpolated drawing
+        self.prev_x, self.prev_y = x, y
         self.color = color
         self.r = RADIUS
         self.hp = MAX_HP
@@ -93,10 +246,10 @@ class Agent:
         return 1.6 if self.hp<=LOW_HP_THRESH else base
     def pause_bleedout(self):
         if self.bleed_paused_start is None:
-            self.bleed_paused_start=pygame.time.get_ticks()
+            self.bleed_paused_start=get_ticks()
     def resume_bleedout(self):
         if self.bleed_paused_start is not None:
-            self.bleed_paused += pygame.time.get_ticks()-self.bleed_paused_start
+            self.bleed_paused += get_ticks()-self.bleed_paused_start
             self.bleed_paused_start=None
     def take_damage(self,dmg):
         if not self.alive:
@@ -108,7 +261,7 @@ class Agent:
             self.lock_reason=None; self.reviving_target=None
         if self.hp<=0:
             self.downed=True; self.alive=False
-            self.downed_at=pygame.time.get_ticks()
+            self.downed_at=get_ticks()
             self.bleed_paused=0; self.bleed_paused_start=None
             self.reviving_target=None
     def revive(self):
@@ -116,10 +269,13 @@ class Agent:
         self.downed_at=0; self.bleed_paused=0; self.bleed_paused_start=None
         self.reviving_target=None
     def move_player(self, keys, walls):
+        self.move_input(keys[pygame.K_d]-keys[pygame.K_a], keys[pygame.K_s]-keys[pygame.K_w], walls)
+    def move_input(self, ix, iy, walls):
+        """Move by the player's input axes (-1, 0 or 1 each)."""
         if not self.alive or self.lock_reason is not None or self.downed:
             return
-        mvx=(keys[pygame.K_d]-keys[pygame.K_a])*self.effective_speed(PLAYER_SPEED)
-        mvy=(keys[pygame.K_s]-keys[pygame.K_w])*self.effective_speed(PLAYER_SPEED)
+        mvx=ix*self.effective_speed(PLAYER_SPEED)
+        mvy=iy*self.effective_speed(PLAYER_SPEED)
         self.x,self.y=move_with_collision(self.x,self.y,mvx,mvy,self.r,walls)
         if mvx!=0 or mvy!=0:
             l=math.hypot(mvx,mvy); self.dir=(mvx/l,mvy/l) if l else self.dir
@@ -139,6 +295,11 @@ class Agent:
             return
         vx, vy = dx / l, dy / l
         self.last_shot = now
+        spawn = getattr(bullets, "spawn", None)
+        if spawn is not None:
+            spawn(self.x + vx * (self.r + 6), self.y + vy * (self.r + 6),
+                  vx * BULLET_SPEED, vy * BULLET_SPEED, self.team, self.weapon.dmg)
+            return
         bullets.append(
             Bullet(
                 self.x + vx * (self.r + 6),
@@ -163,19 +324,23 @@ class Agent:
         else:
             # non weapon items just stored
             self.loadout[item_name] = True
-    def draw(self,surf,cam,font):
+    def draw_pos(self, alpha=1.0):
+        """Position ``alpha`` of the way from the start to the end of the tick."""
+        return (self.prev_x+(self.x-self.prev_x)*alpha, self.prev_y+(self.y-self.prev_y)*alpha)
+    def draw(self,surf,cam,font,alpha=1.0):
+        x,y=self.draw_pos(alpha)
         col=self.color
         if self.downed: col=(120,120,120)
         elif not self.alive: col=(60,60,60)
-        pygame.draw.circle(surf,col,(int(self.x-cam[0]),int(self.y-cam[1])),self.r)
-        fx=self.x+self.dir[0]*self.r*1.4; fy=self.y+self.dir[1]*self.r*1.4
-        pygame.draw.line(surf,WHITE,(self.x-cam[0],self.y-cam[1]),(fx-cam[0],fy-cam[1]),2 if self.alive and not self.downed else 1)
+        pygame.draw.circle(surf,col,(int(x-cam[0]),int(y-cam[1])),self.r)
+        fx=x+self.dir[0]*self.r*1.4; fy=y+self.dir[1]*self.r*1.4
+        pygame.draw.line(surf,WHITE,(x-cam[0],y-cam[1]),(fx-cam[0],fy-cam[1]),2 if self.alive and not self.downed else 1)
         if self.alive:
-            pygame.draw.rect(surf,(40,40,40),(self.x-20-cam[0],self.y-28-cam[1],40,6))
-            pygame.draw.rect(surf,GREEN,(self.x-20-cam[0],self.y-28-cam[1],40*self.hp/MAX_HP,6))
+            pygame.draw.rect(surf,(40,40,40),(x-20-cam[0],y-28-cam[1],40,6))
+            pygame.draw.rect(surf,GREEN,(x-20-cam[0],y-28-cam[1],40*self.hp/MAX_HP,6))
         status=" (DOWN)" if self.downed else (" (DEAD)" if not self.alive else "")
-        label=font.render(self.name+status,True,GREY)
-        surf.blit(label,(self.x-label.get_width()/2-cam[0], self.y+self.r+3-cam[1]))
+        label=render_text(font,self.name+status,GREY)
+        surf.blit(label,(x-label.get_width()/2-cam[0], y+self.r+3-cam[1]))
 
 class BombState:
     def __init__(self, zone_center, radius):
@@ -187,6 +352,6 @@ class BombState:
     def in_zone(self,p):
         return pygame.Vector2(p[0],p[1]).distance_to(self.zone_center) <= self.radius*GRID - 6
     def commit_plant(self, team):
-        self.state='planted'; self.planter_team=team; self.planted_time=pygame.time.get_ticks()
+        self.state='planted'; self.planter_team=team; self.planted_time=get_ticks()
     def commit_defuse(self):
         self.state='defused'
@@ -0,0 +1,143 @@
+"""Flow fields shared by bots heading to the same goal cell.
+
+Instead of every bot running its own A* towards ``bomb.zone_center`` or the
+same remembered enemy, one breadth first search is grown outwards from each
+goal cell.  Every reached cell stores the neighbouring cell one step closer to
+the goal, so following the field is a single list lookup per bot and tick.
+
+The search is resumable: a field only expands as far as needed to reach the
+cells that have actually been queried, and later queries continue where the
+previous one stopped.  Fields that no bot asked for within ``ttl_ms`` are
+dropped by :meth:`FlowFieldService.evict`.
+"""
+
+from collections import deque
+
+from config import FLOW_FIELD_TTL_MS
+
+
+class FlowField:
+    """Breadth first search tree rooted at ``goal`` over a walkability grid."""
+
+    __slots__ = ("goal", "rows", "passable", "next", "frontier", "last_used")
+
+    def __init__(self, passable, cols, rows, goal):
+        self.goal = goal
+        self.rows = rows
+        self.passable = passable
+        n = cols * rows
+        self.next = [-1] * n
+        self.frontier = deque()
+        self.last_used = 0
+        g = goal[0] * rows + goal[1]
+        if passable[g]:
+            self.next[g] = g
+            self.frontier.append(g)
+
+    def _expand_until(self, target):
+        """Grow the search until ``target`` is reached or the grid is exhausted."""
+
+        nxt = self.next
+        passable = self.passable
+        rows = self.rows
+        n = len(nxt)
+        frontier = self.frontier
+        pop = frontier.popleft
+        push = frontier.append
+        while frontier and nxt[target] < 0:
+            cur = pop()
+            r = cur % rows
+            # neighbours: +row, -row, +col, -col
+            if r + 1 < rows:
+                nb = cur + 1
+                if nxt[nb] < 0 and passable[nb]:
+                    nxt[nb] = cur; push(nb)
+            if r > 0:
+                nb = cur - 1
+                if nxt[nb] < 0 and passable[nb]:
+                    nxt[nb] = cur; push(nb)
+            nb = cur + rows
+            if nb < n and nxt[nb] < 0 and passable[nb]:
+                nxt[nb] = cur; push(nb)
+            nb = cur - rows
+            if nb >= 0 and nxt[nb] < 0 and passable[nb]:
+                nxt[nb] = cur; push(nb)
+
+    def next_cell(self, cell):
+        """Cell one step closer to the goal from ``cell``.
+
+        Returns ``cell`` itself at the goal and ``None`` if the goal cannot be
+        reached.
+        """
+
+        i = cell[0] * self.rows + cell[1]
+        if not self.passable[i]:
+            # agents hugging a wall can stand in a blocked cell; step out of
+            # it into the first neighbour the search reaches
+            for nb in self._neighbours(i):
+                if self.passable[nb]:
+                    self._expand_until(nb)
+                    if self.next[nb] >= 0:
+                        return divmod(nb, self.rows)
+            return None
+        if self.next[i] < 0:
+            self._expand_until(i)
+            if self.next[i] < 0:
+                return None
+        return divmod(self.next[i], self.rows)
+
+    def _neighbours(self, i):
+        r = i % self.rows
+        out = [i + self.rows, i - self.rows]
+        if r + 1 < self.rows:
+            out.append(i + 1)
+        if r > 0:
+            out.append(i - 1)
+        return [nb for nb in out if 0 <= nb < len(self.next)]
+
+
+class FlowFieldService:
+    """Cache of :class:`FlowField` objects for one grid, keyed by goal cell."""
+
+    def __init__(self, ttl_ms=FLOW_FIELD_TTL_MS):
+        self.ttl_ms = ttl_ms
+        self.grid = None
+        self.passable = None
+        self.fields = {}
+        self.last_evict = 0
+
+    def bind(self, grid):
+        """Use ``grid`` from now on, dropping fields built for another grid."""
+
+        if grid is not self.grid:
+            self.grid = grid
+            self.passable = [v for col in grid for v in col]
+            self.fields = {}
+
+    def cells_changed(self, grid, cells):
+        """Forget the fields of ``grid`` after ``cells`` of it changed in place."""
+
+        if grid is self.grid:
+            self.grid = None
+            self.bind(grid)
+
+    def get(self, grid, goal, now):
+        """Shared field towards ``goal``, created on first request."""
+
+        self.bind(grid)
+        field = self.fields.get(goal)
+        if field is None:
+            field = FlowField(self.passable, len(grid), len(grid[0]), goal)
+            self.fields[goal] = field
+        field.last_used = now
+        if now - self.last_evict >= self.ttl_ms:
+            self.evict(now)
+        return field
+
+    def evict(self, now):
+        """Drop fields nobody has used for ``ttl_ms``."""
+
+        self.last_evict = now
+        stale = [g for g, f in self.fields.items() if now - f.last_used > self.ttl_ms]
+        for g in stale:
+            del self.fields[g]
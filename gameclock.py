@@ -0,0 +1,55 @@
+"""Game time source.
+
+Entities, the economy helpers and the bot AI used to call
+``pygame.time.get_ticks()`` directly which tied the game logic to wall time.
+They now ask this module instead.  :class:`sim.Simulation` installs its own
+:class:`ManualClock`, in the interactive game as well as in headless tools;
+until one is installed the module falls back to :class:`PygameClock`, the
+wall clock.
+"""
+
+import pygame
+
+
+class PygameClock:
+    """Wall clock backed by ``pygame.time.get_ticks``."""
+
+    def ticks(self):
+        return pygame.time.get_ticks()
+
+    def advance(self, dt_ms):
+        # wall time advances on its own
+        pass
+
+
+class ManualClock:
+    """Clock that only moves when :meth:`advance` is called."""
+
+    def __init__(self, start_ms=0):
+        self.now = start_ms
+
+    def ticks(self):
+        return self.now
+
+    def advance(self, dt_ms):
+        self.now += dt_ms
+
+
+_clock = PygameClock()
+
+
+def install(clock):
+    """Make ``clock`` the time source used by :func:`get_ticks`."""
+
+    global _clock
+    _clock = clock
+
+
+def current():
+    return _clock
+
+
+def get_ticks():
+    """Current game time in milliseconds."""
+
+    return _clock.ticks()
@@ -0,0 +1,305 @@
+"""Hierarchical path finding (HPA*) over the walkability grid.
+
+The grid is cut into square clusters of ``HPA_CLUSTER`` cells.  Wherever two
+neighbouring clusters share a run of open border cells an entrance is placed
+(one transition in the middle of short runs, one at each end of long ones).
+Transition cells become nodes of an abstract graph, linked across the border
+with cost 1 and inside each cluster by their breadth first search distance.
+
+A query first connects start and goal to the nodes of their clusters, runs A*
+on the small abstract graph and then refines each abstract hop with a search
+restricted to a single cluster, so only the clusters along the route are ever
+searched at cell level.  Moves are 4-connected like :func:`ai.astar`.
+
+When walls change, :meth:`HierarchicalPlanner.update` rebuilds the entrances
+and intra-cluster edges of the touched clusters only; :func:`cells_changed`
+applies that to the planner :func:`hpa_path` shares.
+"""
+
+import heapq
+from collections import deque
+
+from config import HPA_CLUSTER
+from profiler import PROFILER
+
+
+class HierarchicalPlanner:
+    """Abstract graph over ``grid[col][row]`` with clusters of ``size`` cells."""
+
+    def __init__(self, grid, size=HPA_CLUSTER):
+        self.grid = grid
+        self.size = size
+        self.cols = len(grid)
+        self.rows = len(grid[0])
+        self.ccols = -(-self.cols // size)
+        self.crows = -(-self.rows // size)
+        self.edges = {}         # node cell -> {node cell: cost}
+        self.refs = {}          # node cell -> number of entrances using it
+        self.nodes = {}         # cluster -> set of node cells
+        self.border_pairs = {}  # border key -> [(cell, cell)] transitions
+        self.segments = {}      # (node, node) -> refined cell path
+        self.links = {}         # non-node cell -> {node: distance}
+        self.expanded = 0
+        for cx in range(self.ccols):
+            for cy in range(self.crows):
+                for border in self._borders_of((cx, cy), outgoing=True):
+                    self._build_border(border)
+        for cx in range(self.ccols):
+            for cy in range(self.crows):
+                self._build_intra((cx, cy))
+
+    # ------------------------------------------------------------------
+    # clusters and borders
+    # ------------------------------------------------------------------
+
+    def cluster_of(self, cell):
+        return (cell[0] // self.size, cell[1] // self.size)
+
+    def _bounds(self, cluster):
+        s = self.size
+        x0 = cluster[0] * s; y0 = cluster[1] * s
+        return x0, y0, min(x0 + s, self.cols), min(y0 + s, self.rows)
+
+    def _borders_of(self, cluster, outgoing=False):
+        """Border keys around ``cluster``.
+
+        ``("v", cx, cy)`` separates ``(cx, cy)`` from ``(cx+1, cy)`` and
+        ``("h", cx, cy)`` separates ``(cx, cy)`` from ``(cx, cy+1)``.
+        """
+
+        cx, cy = cluster
+        out = []
+        if cx + 1 < self.ccols: out.append(("v", cx, cy))
+        if cy + 1 < self.crows: out.append(("h", cx, cy))
+        if not outgoing:
+            if cx > 0: out.append(("v", cx - 1, cy))
+            if cy > 0: out.append(("h", cx, cy - 1))
+        return out
+
+    def _add_node(self, cell):
+        if cell not in self.refs:
+            self.refs[cell] = 0
+            self.edges[cell] = {}
+            self.nodes.setdefault(self.cluster_of(cell), set()).add(cell)
+        self.refs[cell] += 1
+
+    def _drop_node(self, cell):
+        self.refs[cell] -= 1
+        if self.refs[cell] == 0:
+            del self.refs[cell]
+            self.nodes[self.cluster_of(cell)].discard(cell)
+            for nb in self.edges.pop(cell):
+                self.edges[nb].pop(cell, None)
+
+    def _build_border(self, border):
+        kind, cx, cy = border
+        grid = self.grid
+        x0, y0, x1, y1 = self._bounds((cx, cy))
+        if kind == "v":
+            # cells (x1-1, y) | (x1, y) for y in the cluster rows
+            pairs = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            pairs = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+        transitions = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and grid[a[0]][a[1]] and grid[b[0]][b[1]]:
+                run.append((a, b))
+                continue
+            if run:
+                picks = [run[len(run) // 2]] if len(run) < 6 else [run[0], run[-1]]
+                for pa, pb in picks:
+                    self._add_node(pa); self._add_node(pb)
+                    self.edges[pa][pb] = 1
+                    self.edges[pb][pa] = 1
+                    transitions.append((pa, pb))
+                run = []
+        self.border_pairs[border] = transitions
+
+    def _cluster_nodes(self, cluster):
+        return list(self.nodes.get(cluster, ()))
+
+    def _bfs(self, start, bounds, targets=None):
+        """Distances and parents from ``start`` within ``bounds``."""
+
+        grid = self.grid
+        x0, y0, x1, y1 = bounds
+        dist = {start: 0}
+        parent = {start: None}
+        q = deque([start])
+        remaining = len(targets) if targets is not None else -1
+        while q and remaining != 0:
+            cur = q.popleft()
+            self.expanded += 1
+            if targets is not None and cur in targets:
+                remaining -= 1
+            x, y = cur
+            d = dist[cur] + 1
+            for nb in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if nb in dist:
+                    continue
+                nx, ny = nb
+                if x0 <= nx < x1 and y0 <= ny < y1 and grid[nx][ny]:
+                    dist[nb] = d; parent[nb] = cur; q.append(nb)
+        return dist, parent
+
+    def _build_intra(self, cluster):
+        nodes = self._cluster_nodes(cluster)
+        node_set = set(nodes)
+        bounds = self._bounds(cluster)
+        for a in nodes:
+            for nb in [n for n in self.edges[a] if n in node_set]:
+                del self.edges[a][nb]
+        for i, a in enumerate(nodes):
+            rest = nodes[i + 1:]
+            if not rest:
+                continue
+            dist, _ = self._bfs(a, bounds, set(rest))
+            for b in rest:
+                if b in dist:
+                    self.edges[a][b] = dist[b]
+                    self.edges[b][a] = dist[b]
+
+    # ------------------------------------------------------------------
+    # incremental updates
+    # ------------------------------------------------------------------
+
+    def update(self, cells):
+        """Refresh the abstraction after the walkability of ``cells`` changed."""
+
+        dirty = {self.cluster_of(c) for c in cells}
+        borders = set()
+        for cl in dirty:
+            borders.update(self._borders_of(cl))
+        for border in borders:
+            for pa, pb in self.border_pairs.get(border, ()):
+                self.edges[pa].pop(pb, None)
+                self.edges[pb].pop(pa, None)
+                self._drop_node(pa); self._drop_node(pb)
+            self._build_border(border)
+        touched = set(dirty)
+        for kind, cx, cy in borders:
+            touched.add((cx, cy))
+            touched.add((cx + 1, cy) if kind == "v" else (cx, cy + 1))
+        for cl in touched:
+            self._build_intra(cl)
+        self.segments.clear()
+        self.links.clear()
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+
+    def _local_path(self, a, b, bounds):
+        dist, parent = self._bfs(a, bounds, {b})
+        if b not in dist:
+            return None
+        out = []
+        cur = b
+        while cur is not None:
+            out.append(cur); cur = parent[cur]
+        out.reverse()
+        return out
+
+    def _abstract_path(self, start, goal, extra):
+        """A* over the abstract graph plus temporary ``extra`` edges."""
+
+        def neighbours(n):
+            yield from self.edges.get(n, {}).items()
+            yield from extra.get(n, {}).items()
+
+        openh = [(0, start)]
+        g = {start: 0}
+        came = {start: None}
+        closed = set()
+        while openh:
+            _, cur = heapq.heappop(openh)
+            if cur in closed:
+                continue
+            closed.add(cur)
+            if cur == goal:
+                out = []
+                while cur is not None:
+                    out.append(cur); cur = came[cur]
+                out.reverse()
+                return out
+            for nb, cost in neighbours(cur):
+                ng = g[cur] + cost
+                if nb not in g or ng < g[nb]:
+                    g[nb] = ng; came[nb] = cur
+                    h = abs(nb[0] - goal[0]) + abs(nb[1] - goal[1])
+                    heapq.heappush(openh, (ng + h, nb))
+        return None
+
+    def find_path(self, start, goal):
+        """Cell path from ``start`` to ``goal`` (inclusive) or ``None``."""
+
+        if start == goal:
+            return [start]
+        if not self.grid[goal[0]][goal[1]]:
+            return None
+        cs = self.cluster_of(start); cg = self.cluster_of(goal)
+        if cs == cg:
+            local = self._local_path(start, goal, self._bounds(cs))
+            if local:
+                return local
+
+        # temporary links from start/goal to the nodes of their clusters
+        extra = {}
+        def link(cell, cluster):
+            if cell in self.edges:
+                return
+            found = self.links.get(cell)
+            if found is None:
+                nodes = self._cluster_nodes(cluster)
+                dist, _ = self._bfs(cell, self._bounds(cluster), set(nodes))
+                found = {n: dist[n] for n in nodes if n in dist}
+                if len(self.links) > 256:
+                    self.links.clear()
+                self.links[cell] = found
+            for n, d in found.items():
+                extra.setdefault(cell, {})[n] = d
+                extra.setdefault(n, {})[cell] = d
+        link(start, cs)
+        link(goal, cg)
+        route = self._abstract_path(start, goal, extra)
+        if route is None:
+            return None
+
+        path = [start]
+        for a, b in zip(route, route[1:]):
+            ca = self.cluster_of(a)
+            if ca != self.cluster_of(b):
+                path.append(b)
+                continue
+            seg = self.segments.get((a, b))
+            if seg is None:
+                seg = self._local_path(a, b, self._bounds(ca))
+                if seg is None:
+                    return None
+                if a in self.refs and b in self.refs:
+                    self.segments[(a, b)] = seg
+            path.extend(seg[1:])
+        return path
+
+
+_engine = None
+
+
+def hpa_path(grid, start, goal):
+    """Module level convenience wrapper that reuses one planner per grid."""
+
+    global _engine
+    if _engine is None or _engine.grid is not grid:
+        _engine = HierarchicalPlanner(grid)
+    before = _engine.expanded
+    path = _engine.find_path(start, goal)
+    PROFILER.count("path.nodes", _engine.expanded - before)
+    return path
+
+
+def cells_changed(grid, cells):
+    """Update the shared planner after ``cells`` of ``grid`` changed in place."""
+
+    if _engine is not None and _engine.grid is grid:
+        _engine.update(cells)
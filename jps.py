@@ -0,0 +1,296 @@
+"""Jump Point Search on the 8-connected walkability grid.
+
+:func:`ai.astar` expands every 4-neighbour and returns one waypoint per cell.
+This engine moves in 8 directions (diagonals only when both orthogonal cells
+are open, so agents never clip a wall corner), uses the octile distance as
+heuristic and skips over runs of open cells with jump point pruning.  Node
+data lives in flat lists indexed by cell, with a border of blocked cells
+around the grid so no bounds checks are needed.  Straight scans are looked up
+in per-direction tables built with the engine, so long open corridors cost the
+same as short ones.
+
+The jump points are finally string-pulled: every waypoint that can be skipped
+because a straight line to a later one only crosses open cells is dropped, so
+a path across the open map is usually a handful of cells.
+"""
+
+import heapq, math
+
+from profiler import PROFILER
+
+SQRT2 = math.sqrt(2)
+OCTILE = SQRT2 - 1
+
+
+class JumpPointSearch:
+    """Path finder bound to one ``grid[col][row]`` walkability grid."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.cols = cols = len(grid)
+        self.rows = rows = len(grid[0])
+        # padded column height; index of (c, r) is (c+1)*H + r+1
+        self.H = H = rows + 2
+        walk = [False] * ((cols + 2) * H)
+        for c, col in enumerate(grid):
+            base = (c + 1) * H + 1
+            walk[base:base + rows] = col
+        self.walk = walk
+        self.tables = {step: self._straight_table(step, side)
+                       for step, side in ((H, 1), (-H, 1), (1, H), (-1, H))}
+        n = len(walk)
+        self.g = [0.0] * n
+        self.parent = [-1] * n
+        self.stamp = [0] * n
+        self.closed = [0] * n
+        self.search = 0
+        self.expanded = 0
+        self.goal = -1
+
+    # ------------------------------------------------------------------
+    # index helpers
+    # ------------------------------------------------------------------
+
+    def index(self, cell):
+        return (cell[0] + 1) * self.H + cell[1] + 1
+
+    def cell(self, i):
+        c, r = divmod(i, self.H)
+        return (c - 1, r - 1)
+
+    def _h(self, i):
+        H = self.H
+        dx = abs(i // H - self.goal // H)
+        dy = abs(i % H - self.goal % H)
+        return max(dx, dy) + OCTILE * min(dx, dy)
+
+    # ------------------------------------------------------------------
+    # jumping
+    # ------------------------------------------------------------------
+
+    def _straight_table(self, step, side):
+        """For every walkable cell the result of scanning along ``step``.
+
+        The entry is the index of the first jump point (a cell with a forced
+        neighbour, ``side`` being the perpendicular offset) or ``~last`` with
+        ``last`` the final walkable cell before a wall.  Built once per grid,
+        it turns every straight jump into a table lookup.
+        """
+
+        walk = self.walk
+        n = len(walk)
+        table = [-1] * n
+        order = range(n - 1, -1, -1) if step > 0 else range(n)
+        for i in order:
+            if not walk[i]:
+                continue
+            a = i + side; b = i - side
+            if (walk[a] and not walk[a - step]) or (walk[b] and not walk[b - step]):
+                table[i] = i
+            elif walk[i + step]:
+                table[i] = table[i + step]
+            else:
+                table[i] = ~i
+        return table
+
+    def _jump_straight(self, i, step, side):
+        """Jump from ``i`` along ``step``; ``side`` is the perpendicular offset."""
+
+        if not self.walk[i]:
+            return -1
+        e = self.tables[step][i]
+        end = e if e >= 0 else ~e
+        k = self.goal - i
+        if step == 1 or step == -1:
+            on_ray = self.goal // self.H == i // self.H and 0 <= k * step <= (end - i) * step
+        else:
+            on_ray = k % self.H == 0 and 0 <= k // step <= (end - i) // step
+        if on_ray:
+            return self.goal
+        return e if e >= 0 else -1
+
+    def _jump(self, i, dx, dy):
+        H = self.H
+        walk = self.walk
+        if dx and dy:
+            sx = dx * H
+            goal = self.goal
+            while True:
+                if not walk[i]:
+                    return -1
+                if i == goal:
+                    return i
+                if self._jump_straight(i + sx, sx, 1) >= 0 or self._jump_straight(i + dy, dy, H) >= 0:
+                    return i
+                if walk[i + sx] and walk[i + dy]:
+                    i += sx + dy
+                else:
+                    return -1
+        if dx:
+            return self._jump_straight(i, dx * H, 1)
+        return self._jump_straight(i, dy, H)
+
+    def _successors(self, i):
+        """Directions ``(dx, dy)`` worth exploring from node ``i``."""
+
+        walk = self.walk
+        H = self.H
+        p = self.parent[i]
+        if p < 0:
+            out = []
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if not (dx or dy):
+                        continue
+                    if dx and dy:
+                        if walk[i + dx * H] and walk[i + dy]:
+                            out.append((dx, dy))
+                    elif walk[i + dx * H + dy]:
+                        out.append((dx, dy))
+            return out
+        dx = (i // H > p // H) - (i // H < p // H)
+        dy = (i % H > p % H) - (i % H < p % H)
+        out = []
+        if dx and dy:
+            v = walk[i + dy]; h = walk[i + dx * H]
+            if v: out.append((0, dy))
+            if h: out.append((dx, 0))
+            if v and h: out.append((dx, dy))
+        elif dx:
+            nxt = walk[i + dx * H]; up = walk[i + 1]; down = walk[i - 1]
+            if nxt:
+                out.append((dx, 0))
+                if up: out.append((dx, 1))
+                if down: out.append((dx, -1))
+            if up: out.append((0, 1))
+            if down: out.append((0, -1))
+        else:
+            nxt = walk[i + dy]; right = walk[i + H]; left = walk[i - H]
+            if nxt:
+                out.append((0, dy))
+                if right: out.append((1, dy))
+                if left: out.append((-1, dy))
+            if right: out.append((1, 0))
+            if left: out.append((-1, 0))
+        return out
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+
+    def jump_points(self, start, goal):
+        """Jump points from ``start`` to ``goal`` or ``None`` if unreachable."""
+
+        if start == goal:
+            return [start]
+        s = self.index(start); t = self.index(goal)
+        if not self.walk[t]:
+            return None
+        self.search += 1
+        stamp = self.search
+        self.goal = t
+        g = self.g; parent = self.parent; seen = self.stamp; closed = self.closed
+        H = self.H
+        g[s] = 0.0; parent[s] = -1; seen[s] = stamp
+        openh = [(self._h(s), s)]
+        while openh:
+            _, cur = heapq.heappop(openh)
+            if closed[cur] == stamp:
+                continue
+            closed[cur] = stamp
+            self.expanded += 1
+            if cur == t:
+                out = []
+                while cur >= 0:
+                    out.append(self.cell(cur)); cur = parent[cur]
+                out.reverse()
+                return out
+            cx, cy = divmod(cur, H)
+            for dx, dy in self._successors(cur):
+                jp = self._jump(cur + dx * H + dy, dx, dy)
+                if jp < 0 or closed[jp] == stamp:
+                    continue
+                jx, jy = divmod(jp, H)
+                ax = abs(jx - cx); ay = abs(jy - cy)
+                ng = g[cur] + max(ax, ay) + OCTILE * min(ax, ay)
+                if seen[jp] != stamp or ng < g[jp]:
+                    seen[jp] = stamp; g[jp] = ng; parent[jp] = cur
+                    heapq.heappush(openh, (ng + self._h(jp), jp))
+        return None
+
+    def line_clear(self, a, b):
+        """True if the segment between the centres of cells ``a`` and ``b``
+        only crosses walkable cells (both cells count when it passes a corner)."""
+
+        walk = self.walk
+        H = self.H
+        x, y = a
+        dx = b[0] - x; dy = b[1] - y
+        sx = (dx > 0) - (dx < 0); sy = (dy > 0) - (dy < 0)
+        ax = abs(dx); ay = abs(dy)
+        # traverse in half-cell units from centre to centre
+        i = self.index(a)
+        if not walk[i]:
+            return False
+        tx = ty = 0
+        while tx < ax or ty < ay:
+            # compare the parametric positions of the next vertical and
+            # horizontal cell boundary: (2*tx+1)/(2*ax) vs (2*ty+1)/(2*ay)
+            lhs = (2 * tx + 1) * ay
+            rhs = (2 * ty + 1) * ax
+            if lhs < rhs:
+                i += sx * H; tx += 1
+            elif lhs > rhs:
+                i += sy; ty += 1
+            else:
+                if not (walk[i + sx * H] and walk[i + sy]):
+                    return False
+                i += sx * H + sy; tx += 1; ty += 1
+            if not walk[i]:
+                return False
+        return True
+
+    def smooth(self, points):
+        """Drop waypoints that a straight walkable line can skip."""
+
+        if not points or len(points) < 3:
+            return points
+        out = [points[0]]
+        i = 0
+        n = len(points)
+        while i < n - 1:
+            j = n - 1
+            while j > i + 1 and not self.line_clear(points[i], points[j]):
+                j -= 1
+            out.append(points[j])
+            i = j
+        return out
+
+    def find_path(self, start, goal):
+        """Smoothed waypoint cells from ``start`` to ``goal`` or ``None``."""
+
+        pts = self.jump_points(start, goal)
+        return self.smooth(pts) if pts else pts
+
+
+_engine = None
+
+
+def jps_path(grid, start, goal):
+    """Module level convenience wrapper that reuses one engine per grid."""
+
+    global _engine
+    if _engine is None or _engine.grid is not grid:
+        _engine = JumpPointSearch(grid)
+    before = _engine.expanded
+    path = _engine.find_path(start, goal)
+    PROFILER.count("path.nodes", _engine.expanded - before)
+    return path
+
+
+def cells_changed(grid, cells):
+    """Drop the shared engine's tables after ``cells`` of ``grid`` changed in place."""
+
+    global _engine
+    if _engine is not None and _engine.grid is grid:
+        _engine = None
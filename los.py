@@ -0,0 +1,111 @@
+"""Line of sight queries against the wall rects of a map.
+
+:func:`map.has_line_of_sight` used to build the four edges of every wall on
+each call and intersect the sight line with all of them.  :class:`LineOfSight`
+builds the edges once per map and only tests the walls the spatial hash of
+:class:`spatial.WallIndex` reports along the sight line, walking its buckets
+column by column.  The final test is still :func:`map.seg_intersect`, so the
+answers are exactly the ones of the all-edges loop.
+
+:meth:`LineOfSight.clear_many` answers a whole batch of ``(from, to)`` pairs
+at once: candidate edges of all pairs are gathered into flat arrays and the
+intersection tests run vectorized in NumPy with the same arithmetic.  Small
+maps skip the gathering and test every pair against every edge.
+"""
+
+import numpy as np
+
+from map import rect_edges, seg_intersect
+from spatial import WallIndex
+from profiler import PROFILER
+
+# batches with at most this many pair/edge combinations skip the spatial hash
+DENSE_PAIRS = 1 << 16
+
+
+class LineOfSight:
+    """Sight line tests for one static wall list."""
+
+    def __init__(self, walls):
+        self.source = walls
+        self.walls = walls if isinstance(walls, WallIndex) else WallIndex(walls)
+        self.edges = [rect_edges(r) for r in self.walls]
+        # edge k of wall i is row 4*i+k: start point and direction
+        flat = [e for edges in self.edges for e in edges]
+        self.edge_start = np.array([e[0] for e in flat], dtype=float).reshape(-1, 2)
+        self.edge_dir = np.array([(e[1][0] - e[0][0], e[1][1] - e[0][1]) for e in flat],
+                                 dtype=float).reshape(-1, 2)
+
+    def clear(self, p1, p2):
+        """True if the segment ``p1``-``p2`` crosses no wall edge."""
+
+        PROFILER.count("los.queries")
+        edges = self.edges
+        for i in self.walls.segment_indices(p1, p2):
+            for e1, e2 in edges[i]:
+                if seg_intersect(p1, p2, e1, e2):
+                    return False
+        return True
+
+    def clear_many(self, starts, ends):
+        """Vectorized :meth:`clear` for pairs ``starts[i]``-``ends[i]``.
+
+        Returns a boolean array with one entry per pair.
+        """
+
+        n = len(starts)
+        PROFILER.count("los.queries", n)
+        out = np.ones(n, dtype=bool)
+        m = len(self.edge_start)
+        if n == 0 or m == 0:
+            return out
+        if n * m <= DENSE_PAIRS:
+            # few walls: testing every pair against every edge is cheaper
+            # than gathering candidates from the hash in Python
+            pair_idx = np.repeat(np.arange(n), m)
+            edge_idx = np.tile(np.arange(m), n)
+        else:
+            pair_idx = []
+            edge_idx = []
+            for i in range(n):
+                for w in self.walls.segment_indices(starts[i], ends[i]):
+                    pair_idx.extend((i, i, i, i))
+                    edge_idx.extend((4 * w, 4 * w + 1, 4 * w + 2, 4 * w + 3))
+            if not pair_idx:
+                return out
+            pair_idx = np.array(pair_idx)
+            edge_idx = np.array(edge_idx)
+        a1 = np.asarray(starts, dtype=float).reshape(-1, 2)[pair_idx]
+        a2 = np.asarray(ends, dtype=float).reshape(-1, 2)[pair_idx]
+        b1 = self.edge_start[edge_idx]
+        s = self.edge_dir[edge_idx]
+        r = a2 - a1
+        q = b1 - a1
+        denom = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+        ok = denom != 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (q[:, 0] * s[:, 1] - q[:, 1] * s[:, 0]) / denom
+            u = (q[:, 0] * r[:, 1] - q[:, 1] * r[:, 0]) / denom
+        hit = ok & (0 < t) & (t < 1) & (0 < u) & (u < 1)
+        out[pair_idx[hit]] = False
+        return out
+
+
+_engine = None
+
+
+def engine_for(walls):
+    """Shared :class:`LineOfSight` for ``walls``, rebuilt when the map changes."""
+
+    global _engine
+    if _engine is None or _engine.source is not walls:
+        # chunked worlds bring their own engine
+        sight = getattr(walls, "sight", None)
+        _engine = sight() if sight is not None else LineOfSight(walls)
+    return _engine
+
+
+def line_of_sight(p1, p2, walls):
+    """Module level convenience wrapper that reuses one engine per wall list."""
+
+    return engine_for(walls).clear(p1, p2)
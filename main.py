@@ -1,257 +1,139 @@
-import random, sys, pygame
+import argparse, sys, pygame
 from config import *
-from map import (
-    build_static_map,
-    build_grid,
-    pos_to_cell,
-    cell_center,
-    nearest_passable_cell,
-    has_line_of_sight,
-)
-from entities import Agent, Bullet, BombState
-from ai import bot_ai, sees
-from render import load_sprites, draw_bomb
-from ui import draw_minimap, draw_buy_menu, draw_hud
-from economy import start_buy_phase, buy
-
-pygame.init()
-pygame.display.set_caption("Valor 4v4 BombMode")
-screen=pygame.display.set_mode((VIEW_W, VIEW_H))
-clock=pygame.time.Clock()
-font=pygame.font.SysFont("consolas",18)
-big_font=pygame.font.SysFont("consolas",40,bold=True)
-sprites = load_sprites()
+from gameclock import get_ticks
+from sim import Simulation, PlayerInput
+from render import load_sprites, draw_bomb, BackgroundLayer
+from text import get_font, render_text
+from ui import Minimap, draw_buy_menu, draw_hud, draw_profiler
+from profiler import PROFILER
+from replay import Recorder
+from scheduler import AIScheduler
+from pathpool import PathPool
 
 
 def clamp(value, min_value, max_value):
     """Return *value* limited to the inclusive range [min_value, max_value]."""
     return max(min_value, min(max_value, value))
 
-def random_zone(grid):
-    radius=random.randint(BOMB_RADIUS_MIN,BOMB_RADIUS_MAX)
-    while True:
-        c=random.randrange(COLS); r=random.randrange(ROWS)
-        good=True
-        for dx in range(-radius,radius+1):
-            for dy in range(-radius,radius+1):
-                if dx*dx+dy*dy>radius*radius: continue
-                x=c+dx; y=r+dy
-                if x<0 or y<0 or x>=COLS or y>=ROWS or not grid[x][y]:
-                    good=False; break
-            if not good: break
-        if good:
-            return cell_center(c,r), radius
-
-def _make_nav():
-    return {"path": None, "goal": None, "idx": 0, "last_compute": 0}
-
-def _get_nav(navs, agent):
-    # ensure a nav entry exists for this agent object
-    if agent not in navs:
-        navs[agent] = _make_nav()
-    return navs[agent]
-
-def reset_round():
-    walls=build_static_map()
-    grid=build_grid(walls)
-    zone_center, radius = random_zone(grid)
-    bomb=BombState(zone_center, radius)
-    player_team=random.choice(["ATT","DEF"])
-    att_spawns=[(200,HEIGHT-200),(260,HEIGHT-260),(320,HEIGHT-320),(380,HEIGHT-380)]
-    def_spawns=[(WIDTH-200,200),(WIDTH-260,260),(WIDTH-320,320),(WIDTH-380,380)]
-    attackers=[]; defenders=[]
-    if player_team=="ATT":
-        attackers.append(Agent(*att_spawns[0], BLUE, "ATT", True, "YOU"))
-        for i in range(1,4): attackers.append(Agent(*att_spawns[i], BLUE_BOT, "ATT", name=f"ALLY-{i}"))
-        for i in range(4): defenders.append(Agent(*def_spawns[i], RED_BOT if i else RED, "DEF", name=f"ENEMY-{i+1}"))
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a round of Valor.")
+    parser.add_argument("--seed", type=int, default=None, help="round seed, random by default")
+    parser.add_argument("--record", default=None, metavar="LOG", help="record the session for replay.py")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    pygame.display.set_caption("Valor 4v4 BombMode")
+    screen=pygame.display.set_mode((VIEW_W, VIEW_H))
+    clock=pygame.time.Clock()
+    font=get_font(18)
+    big_font=get_font(40,bold=True)
+    sprites = load_sprites()
+
+    # F5 swaps in the round prepared in the background
+    # a recorded session has to replay identically, so it schedules bot
+    # decisions by ticks only instead of by the time they take and plans
+    # paths on the main thread
+    if args.record:
+        scheduler = AIScheduler(); paths = None
     else:
-        defenders.append(Agent(*def_spawns[0], RED, "DEF", True, "YOU"))
-        for i in range(1,4): defenders.append(Agent(*def_spawns[i], RED_BOT, "DEF", name=f"ALLY-{i}"))
-        for i in range(4): attackers.append(Agent(*att_spawns[i], BLUE_BOT if i else BLUE, "ATT", name=f"ENEMY-{i+1}"))
-    navs = {a: _make_nav() for a in attackers[1:] + defenders}
-    return walls,grid,bomb,attackers,defenders,navs
-
-def alive(lst): return [a for a in lst if a.alive]
-def active_or_downed(lst): return [a for a in lst if (a.alive or a.downed)]
-
-def main():
-    walls,grid,bomb,attackers,defenders,navs = reset_round()
-    bullets=[]
-    round_over=False; winner_text=""
+        scheduler = AIScheduler(budget_ms=AI_BUDGET_MS); paths = PathPool()
+    sim = Simulation(seed=args.seed, prefetch=True, scheduler=scheduler, paths=paths)
+    recorder = Recorder(args.record, sim) if args.record else None
+    background = BackgroundLayer()
+    minimap = Minimap()
     running=True
-    buy_end = start_buy_phase(attackers + defenders, None)
     buy_menu_open = False
     weapon_keys = list(WEAPONS.keys())
 
     while running:
-        dt=clock.tick(FPS)
-        for event in pygame.event.get():
-            if event.type==pygame.QUIT:
-                running=False
-            if event.type==pygame.KEYDOWN and event.key==pygame.K_ESCAPE:
-                running=False
-            if event.type==pygame.KEYDOWN and event.key==pygame.K_F5:
-                walls,grid,bomb,attackers,defenders,navs = reset_round()
-                bullets=[]; round_over=False; winner_text=""
-                buy_end = start_buy_phase(attackers + defenders, None)
-                buy_menu_open = False
-            if event.type==pygame.KEYDOWN and event.key==pygame.K_b:
-                if pygame.time.get_ticks() < buy_end:
-                    buy_menu_open = not buy_menu_open
-            if buy_menu_open and event.type==pygame.KEYDOWN:
-                if pygame.K_1 <= event.key <= pygame.K_9:
-                    idx = event.key - pygame.K_1
-                    if idx < len(weapon_keys):
-                        buy(player, weapon_keys[idx])
+        with PROFILER.scope("wait"):
+            dt=clock.tick(RENDER_FPS)
+        player=sim.player
+        pending_buy=None
+        with PROFILER.scope("events"):
+            for event in pygame.event.get():
+                if event.type==pygame.QUIT:
+                    running=False
+                if event.type==pygame.KEYDOWN and event.key==pygame.K_ESCAPE:
+                    running=False
+                if event.type==pygame.KEYDOWN and event.key==pygame.K_F5:
+                    sim.reset(); player=sim.player
+                    buy_menu_open = False
+                if event.type==pygame.KEYDOWN and event.key==pygame.K_F3:
+                    PROFILER.toggle()
+                if event.type==pygame.KEYDOWN and event.key==pygame.K_F4:
+                    PROFILER.export_chrome(PROFILE_TRACE_PATH)
+                if event.type==pygame.KEYDOWN and event.key==pygame.K_b:
+                    if get_ticks() < sim.buy_end:
+                        buy_menu_open = not buy_menu_open
+                if buy_menu_open and event.type==pygame.KEYDOWN:
+                    if pygame.K_1 <= event.key <= pygame.K_9:
+                        idx = event.key - pygame.K_1
+                        if idx < len(weapon_keys):
+                            pending_buy = weapon_keys[idx]
 
         keys=pygame.key.get_pressed()
-        player=[a for a in attackers+defenders if a.is_player][0]
-        now=pygame.time.get_ticks()
-        player.move_player(keys, walls)
-
         mx,my=pygame.mouse.get_pos()
         world_mouse=(mx + clamp(player.x-VIEW_W//2,0,WIDTH-VIEW_W), my + clamp(player.y-VIEW_H//2,0,HEIGHT-VIEW_H))
-        if pygame.mouse.get_pressed()[0]:
-            player.shoot(world_mouse, now, bullets)
-
-        # Player revive/plant/defuse
-        if keys[pygame.K_r]:
-            friends = attackers if player.team=="ATT" else defenders
-            nearest=None; best=1e9
-            for fr in friends:
-                if fr.downed:
-                    d=(player.x-fr.x)**2+(player.y-fr.y)**2
-                    if d<best:
-                        best=d; nearest=fr
-            if nearest and math.hypot(player.x-nearest.x, player.y-nearest.y)<=REVIVE_RANGE:
-                if player.lock_reason is None:
-                    player.lock_reason='revive'; player.lock_start=now; player.reviving_target=nearest; nearest.pause_bleedout()
-                elif player.lock_reason=='revive' and player.reviving_target is nearest:
-                    if now-player.lock_start>=REVIVE_MS:
-                        nearest.revive(); nearest.resume_bleedout(); player.lock_reason=None; player.reviving_target=None
-            else:
-                if player.lock_reason=='revive' and player.reviving_target:
-                    player.reviving_target.resume_bleedout()
-                    player.lock_reason=None; player.reviving_target=None
-        else:
-            if player.lock_reason=='revive' and player.reviving_target:
-                player.reviving_target.resume_bleedout(); player.lock_reason=None; player.reviving_target=None
-        if keys[pygame.K_4]:
-            if bomb.state=='idle' and player.team=='ATT' and bomb.in_zone(player.pos):
-                if player.lock_reason is None:
-                    player.lock_reason='plant'; player.lock_start=now
-                if now-player.lock_start>=PLANT_MS:
-                    bomb.commit_plant(player.team); player.lock_reason=None
-            elif bomb.state=='planted' and player.team=='DEF' and bomb.in_zone(player.pos):
-                if player.lock_reason is None:
-                    player.lock_reason='defuse'; player.lock_start=now
-                if now-player.lock_start>=DEFUSE_MS:
-                    bomb.commit_defuse(); player.lock_reason=None
-        else:
-            if player.lock_reason in ('plant','defuse'):
-                player.lock_reason=None
-
-        # Bots
-        for a in attackers[1:] if player.team=='ATT' else attackers:
-            if not a.is_player:
-                bot_ai(a, defenders, attackers, walls, bullets, grid, _get_nav(navs, a), bomb)
-        for d in defenders[1:] if player.team=='DEF' else defenders:
-            if not d.is_player:
-                bot_ai(d, attackers, defenders, walls, bullets, grid, _get_nav(navs, d), bomb)
-
-        for b in bullets:
-            b.update(walls)
-            if b.dead: continue
-            targets = defenders if b.team=='ATT' else attackers
-            for t in targets:
-                if (t.alive or t.downed) and pygame.Vector2(b.x,b.y).distance_to(t.pos) <= RADIUS+BULLET_RADIUS:
-                    if t.alive:
-                        t.take_damage(b.dmg)
-                    b.dead=True; break
-        bullets=[b for b in bullets if not b.dead]
-
-        now_tick = pygame.time.get_ticks()
-        for a in attackers:
+        with PROFILER.scope("sim"):
+            alpha=sim.advance(dt, PlayerInput(
+                keys[pygame.K_d]-keys[pygame.K_a],
+                keys[pygame.K_s]-keys[pygame.K_w],
+                world_mouse,
+                pygame.mouse.get_pressed()[0],
+                keys[pygame.K_r],
+                keys[pygame.K_4],
+                pending_buy,
+            ))
+        now=get_ticks()
+        walls,bomb,attackers,defenders,bullets=sim.walls,sim.bomb,sim.attackers,sim.defenders,sim.bullets
+        round_over,winner_text=sim.round_over,sim.winner_text
+
+        # draw everything where it is between the last two ticks
+        px, py = player.draw_pos(alpha)
+        cam_x = clamp(px - VIEW_W//2, 0, WIDTH - VIEW_W)
+        cam_y = clamp(py - VIEW_H//2, 0, HEIGHT - VIEW_H)
+
+        with PROFILER.scope("draw.background"):
+            background.draw(screen, walls, (cam_x, cam_y))
+            pygame.draw.circle(screen,(60,60,60),(bomb.zone_center[0]-cam_x,bomb.zone_center[1]-cam_y),bomb.radius*GRID,2)
+            draw_bomb(screen, bomb, sprites, (cam_x, cam_y))
+
+        with PROFILER.scope("draw.agents"):
+            for a in attackers:
+                a.draw(screen,(cam_x,cam_y),font,alpha)
             for d in defenders:
-                if sees(a, d, walls):
-                    d.seen_by_att = now_tick
-                if sees(d, a, walls):
-                    a.seen_by_def = now_tick
-
-        tick = now_tick
-        for ag in attackers + defenders:
-            if ag.downed and tick - ag.downed_at - ag.bleed_paused >= BLEEDOUT_MS:
-                ag.downed=False; ag.alive=False; ag.hp=0; ag.reviving_target=None
-                ag.bleed_paused=0; ag.bleed_paused_start=None
-
-        if bomb.state=='planted' and pygame.time.get_ticks()-bomb.planted_time >= BOMB_TIMER_MS:
-            bomb.state='exploded'
-
-        A_active=len(active_or_downed(attackers))
-        D_active=len(active_or_downed(defenders))
-        A_alive=len(alive(attackers))
-        D_alive=len(alive(defenders))
-
-        if bomb.state=='idle':
-            if A_alive==0 and all(not a.downed for a in attackers):
-                winner_text="DEFENDERS WIN — Attackers eliminated"; round_over=True
-            elif D_alive==0 and all(not d.downed for d in defenders):
-                winner_text="ATTACKERS WIN — Defenders eliminated"; round_over=True
-        elif bomb.state=='planted':
-            if D_alive==0 and all(not d.downed for d in defenders):
-                winner_text="ATTACKERS WIN — All defenders down"; round_over=True
-            elif bomb.state=='exploded':
-                winner_text="ATTACKERS WIN — Bomb exploded"; round_over=True
-            elif bomb.state=='defused':
-                winner_text="DEFENDERS WIN — Bomb defused"; round_over=True
-
-        cam_x = clamp(player.x - VIEW_W//2, 0, WIDTH - VIEW_W)
-        cam_y = clamp(player.y - VIEW_H//2, 0, HEIGHT - VIEW_H)
-
-        screen.fill(GRID_DARK)
-        for x in range(0, WIDTH, 48):
-            if cam_x <= x <= cam_x+VIEW_W:
-                pygame.draw.line(screen, GRID_LINE, (x-cam_x,0), (x-cam_x,VIEW_H))
-        for y in range(0, HEIGHT, 48):
-            if cam_y <= y <= cam_y+VIEW_H:
-                pygame.draw.line(screen, GRID_LINE, (0,y-cam_y), (VIEW_W,y-cam_y))
-        for rect in walls:
-            pygame.draw.rect(screen, WALL_DARK, rect.move(-cam_x,-cam_y))
-            pygame.draw.rect(screen, WALL_EDGE, rect.move(-cam_x,-cam_y),2)
-        pygame.draw.circle(screen,(60,60,60),(bomb.zone_center[0]-cam_x,bomb.zone_center[1]-cam_y),bomb.radius*GRID,2)
-        draw_bomb(screen, bomb, sprites, (cam_x, cam_y))
-
-        for a in attackers:
-            a.draw(screen,(cam_x,cam_y),font)
-        for d in defenders:
-            d.draw(screen,(cam_x,cam_y),font)
-        for b in bullets:
-            b.draw(screen,(cam_x,cam_y))
+                d.draw(screen,(cam_x,cam_y),font,alpha)
+        with PROFILER.scope("draw.bullets"):
+            bullets.draw(screen,(cam_x,cam_y),alpha)
 
         def bar(x,y,w,h,frac,col):
             pygame.draw.rect(screen,(40,40,40),(x,y,w,h),border_radius=4)
             pygame.draw.rect(screen,col,(x,y,int(w*frac),h),border_radius=4)
-        bar(16,16,300,14,(player.hp/MAX_HP) if player.alive else 0.0, BLUE if player.team=='ATT' else RED)
-        draw_hud(screen, player)
-        draw_minimap(screen, player, walls, bomb, attackers + defenders)
+        with PROFILER.scope("draw.hud"):
+            bar(16,16,300,14,(player.hp/MAX_HP) if player.alive else 0.0, BLUE if player.team=='ATT' else RED)
+            draw_hud(screen, player)
+        with PROFILER.scope("draw.minimap"):
+            minimap.draw(screen, player, walls, bomb, attackers + defenders)
         if buy_menu_open:
-            draw_buy_menu(screen, player)
+            with PROFILER.scope("draw.hud"):
+                draw_buy_menu(screen, player)
 
         if player.lock_reason=='plant' and bomb.state=='idle':
             t=max(0,min(PLANT_MS, now-player.lock_start))
             pygame.draw.rect(screen,(50,50,50),(20,VIEW_H-60,320,16),border_radius=4)
             pygame.draw.rect(screen,(0,180,255),(20,VIEW_H-60,int(320*t/PLANT_MS),16),border_radius=4)
-            screen.blit(font.render("PLANTING...",True,WHITE),(24,VIEW_H-80))
+            screen.blit(render_text(font,"PLANTING...",WHITE),(24,VIEW_H-80))
         if player.lock_reason=='defuse' and bomb.state=='planted':
             t=max(0,min(DEFUSE_MS, now-player.lock_start))
             pygame.draw.rect(screen,(50,50,50),(20,VIEW_H-60,320,16),border_radius=4)
             pygame.draw.rect(screen,(0,255,120),(20,VIEW_H-60,int(320*t/DEFUSE_MS),16),border_radius=4)
-            screen.blit(font.render("DEFUSING...",True,WHITE),(24,VIEW_H-80))
+            screen.blit(render_text(font,"DEFUSING...",WHITE),(24,VIEW_H-80))
         if player.lock_reason=='revive' and player.reviving_target is not None:
             t=max(0,min(REVIVE_MS, now-player.lock_start))
             pygame.draw.rect(screen,(50,50,50),(20,VIEW_H-88,320,16),border_radius=4)
             pygame.draw.rect(screen,(255,220,80),(20,VIEW_H-88,int(320*t/REVIVE_MS),16),border_radius=4)
-            screen.blit(font.render("REVIVING...",True,WHITE),(24,VIEW_H-108))
+            screen.blit(render_text(font,"REVIVING...",WHITE),(24,VIEW_H-108))
 
         for side in (attackers, defenders):
             for ag in side:
@@ -262,11 +144,19 @@ def main():
                     pygame.draw.rect(screen,(255,220,80),(tgt.x-24-cam_x,tgt.y-40-cam_y,int(48*t/REVIVE_MS),8))
 
         if round_over:
-            t = big_font.render(winner_text or "Round Over", True, YELLOW)
+            t = render_text(big_font, winner_text or "Round Over", YELLOW)
             screen.blit(t,(VIEW_W//2 - t.get_width()//2, VIEW_H//2 - t.get_height()//2))
-            screen.blit(font.render("Press F5 to restart | ESC to quit", True, WHITE),(VIEW_W//2-160, VIEW_H//2+40))
-
-        pygame.display.flip()
+            screen.blit(render_text(font, "Press F5 to restart | ESC to quit", WHITE),(VIEW_W//2-160, VIEW_H//2+40))
+
+        if PROFILER.enabled:
+            draw_profiler(screen, PROFILER)
+        with PROFILER.scope("flip"):
+            pygame.display.flip()
+        PROFILER.end_frame()
+    if recorder is not None:
+        recorder.close()
+    if paths is not None:
+        paths.close()
     pygame.quit(); sys.exit()
 
 if __name__=='__main__':
@@ -1,5 +1,8 @@
-import math, pygame, random
+import math, pygame
+import numpy as np
 from config import WIDTH, HEIGHT, GRID, COLS, ROWS, RADIUS
+from spatial import WallIndex
+from clearance import clearance_for, NEAREST_RING
 
 # basic helpers
 
@@ -35,11 +38,9 @@ def resolve_circle_rect_collision(pos,r,rect):
     return (cx+ux*over, cy+uy*over)
 
 def has_line_of_sight(p1,p2,walls):
-    for rect in walls:
-        for e1,e2 in rect_edges(rect):
-            if seg_intersect(p1,p2,e1,e2):
-                return False
-    return True
+    """True if no wall edge crosses the segment; see :mod:`los`."""
+    from los import line_of_sight
+    return line_of_sight(p1,p2,walls)
 
 # map building
 
@@ -54,36 +55,60 @@ def build_static_map():
         pygame.Rect(800, 840, 40, HEIGHT-1680),
         pygame.Rect(WIDTH-840, 840, 40, HEIGHT-1680),
     ]
-    return walls
+    return WallIndex(walls)
 
 
-def build_procedural_world(seed=None):
-    """Very small placeholder procedural generator.
+def build_procedural_world(seed=None, chunks=None):
+    """Generated world of ``chunks`` (columns, rows) chunks, see :mod:`chunks`.
 
-    The real project would create several themed areas and cover nodes.  For the
-    unit tests we simply call :func:`build_static_map` and return the grid along
-    with empty placeholders for the additional data.
+    Returns ``(walls, grid, world, sites)``: the chunked walls and grid proxies,
+    the :class:`chunks.ChunkWorld` itself, which also answers cover queries
+    (:meth:`~chunks.ChunkWorld.cover_near`), and the two bomb site cells.
+    Chunks are generated as they are first queried.  The sites are close
+    together whatever the size (``PROC_SITE_CHUNKS``): bots plan with A*
+    over the chunked grid, which does not scale to routes across the whole
+    world.
     """
 
-    if seed is not None:
-        random.seed(seed)
-    walls = build_static_map()
-    grid = build_grid(walls)
-    cover_nodes = []
-    sites = {"A": None, "B": None}
-    return walls, grid, cover_nodes, sites
-
-def build_grid(walls):
-    grid=[[True for _ in range(ROWS)] for _ in range(COLS)]
-    for c in range(COLS):
-        for r in range(ROWS):
-            cell=pygame.Rect(c*GRID,r*GRID,GRID,GRID)
-            for w in walls:
-                if cell.colliderect(w.inflate(RADIUS*2,RADIUS*2)):
-                    grid[c][r]=False; break
+    from chunks import ChunkWorld
+    from config import PROC_CHUNKS
+
+    world = ChunkWorld(0 if seed is None else seed, chunks or (PROC_CHUNKS, PROC_CHUNKS))
+    return world.walls, world.grid, world, world.sites
+
+def build_grid_array(walls, cols=COLS, rows=ROWS):
+    """Walkability grid as a ``(cols, rows)`` boolean NumPy array.
+
+    A cell is blocked when it overlaps a wall inflated by the agent radius.
+    Instead of testing every cell against every wall, each inflated wall is
+    rasterized straight into the array as the range of cells it overlaps
+    (``Rect.colliderect`` semantics: edges that only touch do not count).
+    """
+
+    grid=np.ones((cols,rows),dtype=bool)
+    for w in walls:
+        x,y,ww,hh=w.inflate(RADIUS*2,RADIUS*2)
+        if ww<=0 or hh<=0:
+            continue
+        c0=max(0,x//GRID); c1=min(cols,-(-(x+ww)//GRID))
+        r0=max(0,y//GRID); r1=min(rows,-(-(y+hh)//GRID))
+        if c0<c1 and r0<r1:
+            grid[c0:c1,r0:r1]=False
     return grid
 
-def pos_to_cell(p):
+def build_grid(walls, cols=COLS, rows=ROWS):
+    """Walkability grid as nested lists indexed ``grid[col][row]``."""
+    return build_grid_array(walls, cols, rows).tolist()
+
+def pos_to_cell(p, grid=None):
+    """Cell of position ``p`` clamped to the map, or to ``grid``'s own bounds.
+
+    Grids of another size than the built-in map (:class:`chunks.ChunkGrid`)
+    convert positions themselves.
+    """
+    own=getattr(grid,'cell_of',None)
+    if own is not None:
+        return own(*p)
     x,y=p
     return (clamp(int(x//GRID),0,COLS-1), clamp(int(y//GRID),0,ROWS-1))
 
@@ -91,6 +116,16 @@ def cell_center(c,r):
     return (c*GRID+GRID//2, r*GRID+GRID//2)
 
 def nearest_passable_cell(grid, cell, max_ring=20):
+    """Closest walkable cell to ``cell`` within ``max_ring`` rings, else ``cell``.
+
+    The default search is answered from the table of :mod:`clearance`;
+    grids with a search of their own (:class:`chunks.ChunkGrid`) run that.
+    """
+    own=getattr(grid,'nearest_passable',None)
+    if own is not None:
+        return own(cell, max_ring)
+    if max_ring==NEAREST_RING:
+        return clearance_for(grid).nearest_passable(cell)
     cx,cy=cell
     if grid[cx][cy]:
         return (cx,cy)
@@ -109,13 +144,30 @@ def nearest_passable_cell(grid, cell, max_ring=20):
 
 # movement with wall sliding
 
+def _push_out(cx,cy,r,walls,axis):
+    """Resolve the circle against ``walls`` in list order along one axis."""
+    near=getattr(walls,'circle_indices',None)
+    if near is None:
+        for rect in walls:
+            if circle_rect_collision(cx,cy,r,rect):
+                p=resolve_circle_rect_collision((cx,cy),r,rect)
+                if axis==0: cx=p[0]
+                else: cy=p[1]
+        return cx,cy
+    todo=near(cx,cy,r); i=0
+    while i<len(todo):
+        k=todo[i]; i+=1
+        rect=walls[k]
+        if circle_rect_collision(cx,cy,r,rect):
+            p=resolve_circle_rect_collision((cx,cy),r,rect)
+            if axis==0: cx=p[0]
+            else: cy=p[1]
+            # the circle moved: the walls after this one are tested at the
+            # new position, exactly like the plain loop does
+            todo=[j for j in near(cx,cy,r) if j>k]; i=0
+    return cx,cy
+
 def move_with_collision(x,y,vx,vy,r,walls):
-    nx=x+vx
-    for rect in walls:
-        if circle_rect_collision(nx,y,r,rect):
-            nx, _ = resolve_circle_rect_collision((nx,y),r,rect)
-    ny=y+vy
-    for rect in walls:
-        if circle_rect_collision(nx,ny,r,rect):
-            _, ny = resolve_circle_rect_collision((nx,ny),r,rect)
+    nx,_=_push_out(x+vx,y,r,walls,0)
+    _,ny=_push_out(nx,y+vy,r,walls,1)
     return nx, ny
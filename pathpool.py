@@ -0,0 +1,228 @@
+"""Path requests served by a pool of worker processes.
+
+A bot that replans runs :func:`ai.astar` (or the ``jps``/``hpa`` planner) on
+the main thread, and when several bots replan on the same tick the frame
+spikes.  With a :class:`PathPool` attached to the simulation, replanning only
+queues a request and the bot keeps following its current path until the
+result arrives a few ticks later:
+
+* The walkability grid is copied once into shared memory; every worker
+  attaches to it when it starts and plans on its own read-only copy, so no
+  request carries the grid.
+* Requests with the same ``(mode, start, goal)`` are coalesced into one job
+  that every requester collects the result of.
+* A bot that changes its goal releases its pending request; a job nobody
+  waits for any more is cancelled if it has not started yet.
+
+Results arrive after a delay that depends on the machine, so rounds played
+with a pool are not reproducible; recordings and tests plan synchronously.
+The ``dstar`` planner keeps per bot state and the flow fields are shared
+already, so both keep running in the simulation.
+"""
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+# spawned workers import pygame through ai and inherit this environment;
+# without it every worker prints the pygame banner
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from config import PATH_WORKERS
+from profiler import PROFILER
+
+# per worker process state, filled in by _init_worker
+_shm = None
+_grid = None
+
+
+def _init_worker(name, shape):
+    global _shm, _grid
+    try:
+        _shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        # the pool was closed before this worker started; it is about to
+        # be shut down
+        return
+    _grid = np.ndarray(shape, dtype=bool, buffer=_shm.buf).tolist()
+
+
+def _plan(mode, start, goal):
+    from ai import PLANNERS
+
+    return PLANNERS[mode](_grid, start, goal)
+
+
+class PathPool:
+    """Asynchronous path planning for the grid passed to :meth:`bind`."""
+
+    def __init__(self, workers=PATH_WORKERS):
+        self.workers = workers
+        self.grid = None
+        self.shm = None
+        self.executor = None
+        self.shape = None
+        # bumped whenever the executor is replaced
+        self.generation = 0
+        # (mode, start, goal) -> [future, number of requesters, generation]
+        self.jobs = {}
+
+    def bind(self, grid):
+        """Serve requests on ``grid``; restarts the workers when it changed."""
+
+        if grid is self.grid:
+            return
+        if getattr(grid, "chunked", False):
+            raise TypeError("chunked grids cannot be copied to the workers; plan synchronously")
+        self.close()
+        self._share(grid, np.asarray(grid, dtype=bool))
+
+    def refresh(self, grid):
+        """Serve ``grid`` again after cells of it changed.
+
+        The workers are restarted on the new contents and every pending
+        request is planned again, so its requesters still collect a path.
+        """
+
+        pending = [(key, job[1]) for key, job in self.jobs.items()]
+        self.clear()
+        walk = np.asarray(grid, dtype=bool)
+        if self.shm is not None and walk.shape == self.shape:
+            # overwrite in place: workers of the old executor may still be
+            # starting up and attach to the block by name
+            np.ndarray(self.shape, dtype=bool, buffer=self.shm.buf)[:] = walk
+            self.grid = grid
+            self._restart()
+        else:
+            self.close()
+            self._share(grid, walk)
+        for key, count in pending:
+            self.jobs[key] = [self._submit(*key), count, self.generation]
+
+    def _share(self, grid, walk):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, walk.nbytes))
+        np.ndarray(walk.shape, dtype=bool, buffer=self.shm.buf)[:] = walk
+        self.shape = walk.shape
+        self.grid = grid
+        self._start()
+
+    def _start(self):
+        # spawn: forking a process that runs threads (round prefetch) is unsafe
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"),
+                                            initializer=_init_worker, initargs=(self.shm.name, self.shape))
+
+    def _restart(self):
+        """Replace a broken executor; the shared grid stays."""
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._start()
+        self.generation += 1
+
+    def _submit(self, mode, start, goal):
+        try:
+            return self.executor.submit(_plan, mode, start, goal)
+        except BrokenProcessPool:
+            self._restart()
+            return self.executor.submit(_plan, mode, start, goal)
+
+    def _plan_here(self, mode, start, goal):
+        """Plan on the calling thread, for requests the workers failed."""
+
+        from ai import PLANNERS
+
+        PROFILER.count("path.fallbacks")
+        done = Future()
+        done.set_result(PLANNERS[mode](self.grid, start, goal))
+        return done
+
+    def request(self, mode, start, goal):
+        """Queue a path request and return its key for :meth:`poll`."""
+
+        key = (mode, start, goal)
+        job = self.jobs.get(key)
+        if job is None:
+            PROFILER.count("path.requests")
+            future = self._submit(mode, start, goal)
+            job = self.jobs[key] = [future, 0, self.generation]
+        job[1] += 1
+        return key
+
+    def plan_many(self, mode, pairs):
+        """Paths for every ``(start, goal)`` in ``pairs``, waiting for all of them.
+
+        Bypasses the request bookkeeping, so a thread other than the one
+        polling bot requests may call it.  Pairs the workers failed get
+        ``None``.
+        """
+
+        futures = {}
+        for pair in pairs:
+            if pair not in futures:
+                futures[pair] = self._submit(mode, *pair)
+        out = []
+        for pair in pairs:
+            try:
+                out.append(futures[pair].result())
+            except Exception:
+                out.append(None)
+        return out
+
+    def release(self, key):
+        """Stop waiting for ``key``; the job is cancelled when nobody waits."""
+
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        job[1] -= 1
+        if job[1] <= 0:
+            job[0].cancel()
+            del self.jobs[key]
+
+    def __contains__(self, key):
+        return key in self.jobs
+
+    def poll(self, key):
+        """``(True, path)`` once the result of ``key`` is in, else ``(False, None)``.
+
+        Collecting the result releases the request.  A request the workers
+        failed (a planner error or a worker that died) is planned on the
+        calling thread instead, and a broken pool is restarted.  A key the
+        pool does not know (dropped by :meth:`clear`) never completes; check
+        with ``key in pool``.
+        """
+
+        job = self.jobs.get(key)
+        if job is None or not job[0].done():
+            return False, None
+        try:
+            path = job[0].result()
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool) and job[2] == self.generation:
+                self._restart()
+            # coalesced requesters collect the same fallback
+            job[0] = self._plan_here(*key)
+            path = job[0].result()
+        self.release(key)
+        return True, path
+
+    def clear(self):
+        """Drop every pending request, e.g. when a new round starts."""
+
+        for future, _, _ in self.jobs.values():
+            future.cancel()
+        self.jobs.clear()
+
+    def close(self):
+        self.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        self.grid = None
+        self.shape = None
@@ -0,0 +1,97 @@
+"""Team against team visibility, computed once per simulation tick.
+
+Bots used to call :func:`ai.sees` for the same pair of agents several times a
+tick (when looking for enemies, again when picking a target) and the
+simulation called it once more for every attacker/defender pair to update the
+minimap memory, each time with an ``acos`` for the field of view test.
+
+:class:`Perception` computes both visibility matrices in one go at the start
+of a tick.  Range and field of view are tested for all pairs at once with
+squared distances and dot products; only pairs passing both reach the line of
+sight engine, in one batched :meth:`los.LineOfSight.clear_many` call.  Bots,
+targeting and the ``seen_by_att``/``seen_by_def`` memory all read the result.
+"""
+
+import math
+
+import numpy as np
+
+from config import FOV_DEGREES, FOV_RANGE
+from los import engine_for
+
+COS_HALF_FOV = math.cos(math.radians(FOV_DEGREES * 0.5))
+
+
+def in_view(ax, ay, dir_x, dir_y, bx, by):
+    """Range and field of view test of ``(bx, by)`` for an agent at ``(ax, ay)``.
+
+    Works elementwise on NumPy arrays as well as on plain numbers.
+    """
+
+    dx = bx - ax; dy = by - ay
+    d2 = dx * dx + dy * dy
+    f2 = dir_x * dir_x + dir_y * dir_y
+    dot = dx * dir_x + dy * dir_y
+    # angle <= FOV/2  <=>  dot >= cos(FOV/2) * |d| * |dir|
+    return ((d2 <= FOV_RANGE * FOV_RANGE) & (d2 > 0) & (f2 > 0)
+            & (dot >= COS_HALF_FOV * np.sqrt(d2 * f2)))
+
+
+class Perception:
+    """Who sees whom in the current tick."""
+
+    def __init__(self):
+        self.rows = {}
+        self.seen = {}
+        self.att_sees = np.zeros((0, 0), dtype=bool)
+        self.def_sees = np.zeros((0, 0), dtype=bool)
+        self.los_queries = 0
+
+    def _matrix(self, observers, targets, engine):
+        if not observers or not targets:
+            return np.zeros((len(observers), len(targets)), dtype=bool)
+        o = np.array([(a.x, a.y, a.dir[0], a.dir[1]) for a in observers], dtype=float)
+        t = np.array([(b.x, b.y) for b in targets], dtype=float)
+        live = np.array([getattr(b, "alive", False) for b in targets], dtype=bool)
+        vis = in_view(o[:, 0:1], o[:, 1:2], o[:, 2:3], o[:, 3:4], t[None, :, 0], t[None, :, 1])
+        vis &= live[None, :]
+        oi, ti = np.nonzero(vis)
+        if len(oi):
+            self.los_queries += len(oi)
+            clear = engine.clear_many(o[oi, 0:2], t[ti])
+            vis[oi[~clear], ti[~clear]] = False
+        return vis
+
+    def update(self, attackers, defenders, walls, now):
+        """Recompute both matrices and refresh the agents' ``seen_by`` stamps."""
+
+        engine = engine_for(walls)
+        self.rows = {a: i for i, a in enumerate(attackers)}
+        self.rows.update((d, i) for i, d in enumerate(defenders))
+        self.att_sees = self._matrix(attackers, defenders, engine)
+        self.def_sees = self._matrix(defenders, attackers, engine)
+        self.seen = {}
+        for m, observers, targets in ((self.att_sees, attackers, defenders),
+                                      (self.def_sees, defenders, attackers)):
+            for i, j in zip(*np.nonzero(m)):
+                self.seen.setdefault(observers[i], []).append(targets[j])
+        for j in np.nonzero(self.att_sees.any(axis=0))[0]:
+            defenders[j].seen_by_att = now
+        for j in np.nonzero(self.def_sees.any(axis=0))[0]:
+            attackers[j].seen_by_def = now
+
+    def sees(self, observer, target):
+        """True if ``observer`` saw ``target`` at the start of this tick."""
+
+        if observer.team == target.team:
+            return False
+        m = self.att_sees if observer.team == "ATT" else self.def_sees
+        i = self.rows.get(observer); j = self.rows.get(target)
+        if i is None or j is None or i >= m.shape[0] or j >= m.shape[1]:
+            return False
+        return bool(m[i, j])
+
+    def visible(self, observer):
+        """Enemies ``observer`` saw at the start of this tick, in team order."""
+
+        return self.seen.get(observer, [])
@@ -0,0 +1,129 @@
+"""Frame profiler with named timing scopes and counters.
+
+Stages of the frame and of a simulation tick are wrapped in
+``with PROFILER.scope("name"):`` blocks and hot spots report counters with
+:meth:`Profiler.count` (paths recomputed, search nodes expanded, line of
+sight queries).  While the profiler is disabled, ``scope`` hands back one
+shared no-op context manager and ``count`` returns immediately, so the
+instrumentation can stay in place.
+
+When enabled, every scope is recorded as a trace event.  Per frame totals
+feed rolling averages for the on-screen overlay (:func:`ui.draw_profiler`)
+and :meth:`Profiler.export_chrome` writes the events in Chrome's trace event
+format, viewable in ``chrome://tracing`` or Perfetto.
+"""
+
+import json, os
+from collections import deque
+from time import perf_counter_ns
+
+from config import PROFILE_WINDOW, PROFILE_MAX_EVENTS
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullScope()
+
+
+class _Scope:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._record(self.name, self.t0, perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Collects scope timings and counters frame by frame."""
+
+    def __init__(self, window=PROFILE_WINDOW, max_events=PROFILE_MAX_EVENTS):
+        self.enabled = False
+        self.window = window
+        self.events = deque(maxlen=max_events)
+        self.frame_times = {}
+        self.frame_counts = {}
+        self.history = deque(maxlen=window)
+        self.origin = perf_counter_ns()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def scope(self, name):
+        """Context manager timing the enclosed block as ``name``."""
+
+        if not self.enabled:
+            return _NULL
+        return _Scope(self, name)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        self.frame_counts[name] = self.frame_counts.get(name, 0) + n
+
+    def _record(self, name, t0, t1):
+        self.events.append((name, t0, t1 - t0))
+        self.frame_times[name] = self.frame_times.get(name, 0) + (t1 - t0)
+
+    def end_frame(self):
+        """Close the current frame and start collecting the next one."""
+
+        if not self.enabled:
+            return
+        self.history.append((self.frame_times, self.frame_counts))
+        if self.frame_counts:
+            self.events.append(("#counters", perf_counter_ns(), dict(self.frame_counts)))
+        self.frame_times = {}
+        self.frame_counts = {}
+
+    def averages(self):
+        """Mean milliseconds per frame and mean counts per frame over the window."""
+
+        n = len(self.history)
+        times = {}; counts = {}
+        for ft, fc in self.history:
+            for k, v in ft.items():
+                times[k] = times.get(k, 0) + v
+            for k, v in fc.items():
+                counts[k] = counts.get(k, 0) + v
+        if n:
+            times = {k: v / n / 1e6 for k, v in times.items()}
+            counts = {k: v / n for k, v in counts.items()}
+        return times, counts
+
+    def export_chrome(self, path):
+        """Write the recorded events as Chrome trace event JSON."""
+
+        events = []
+        pid = os.getpid()
+        for name, t0, val in self.events:
+            ts = (t0 - self.origin) / 1000
+            if name == "#counters":
+                events.append({"name": "counters", "ph": "C", "ts": ts, "pid": pid, "tid": 0, "args": val})
+            else:
+                events.append({"name": name, "ph": "X", "ts": ts, "dur": val / 1000, "pid": pid, "tid": 0})
+        with open(path, "w") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+        return len(events)
+
+
+PROFILER = Profiler()
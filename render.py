@@ -1,6 +1,10 @@
 import math
+from collections import OrderedDict
+
 import pygame
-from config import GRID, BOMB_TIMER_MS
+from config import (GRID, BOMB_TIMER_MS, GRID_DARK, GRID_LINE, WALL_DARK, WALL_EDGE,
+                    BG_TILE, BG_TILE_CACHE, BG_LINE_STEP)
+from gameclock import get_ticks
 
 
 def load_sprites():
@@ -33,7 +37,7 @@ def draw_bomb(surface, bomb_state, sprites, cam=(0, 0)):
         pygame.draw.circle(surface, (120, 120, 160), pos, 8)
 
     if bomb_state.state == "planted":
-        elapsed = pygame.time.get_ticks() - bomb_state.planted_time
+        elapsed = get_ticks() - bomb_state.planted_time
         remaining = max(0, BOMB_TIMER_MS - elapsed)
         frac = remaining / BOMB_TIMER_MS if BOMB_TIMER_MS else 0
         radius = 16
@@ -42,3 +46,76 @@ def draw_bomb(surface, bomb_state, sprites, cam=(0, 0)):
         start_angle = -math.pi / 2
         end_angle = start_angle + 2 * math.pi * frac
         pygame.draw.arc(surface, (255, 60, 60), rect, start_angle, end_angle, 3)
+
+
+class BackgroundLayer:
+    """Grid lines and walls pre-rendered into square tiles of ``BG_TILE`` px.
+
+    Nothing on the background ever changes during a round, so each tile is
+    drawn once, the first time it comes into view, and afterwards a frame only
+    blits the few tiles overlapping the camera.  Tiles are kept in a bounded
+    LRU and thrown away when :meth:`draw` is handed a different wall list.
+    """
+
+    def __init__(self, tile=BG_TILE, max_tiles=BG_TILE_CACHE):
+        self.tile = tile
+        self.max_tiles = max_tiles
+        self.walls = None
+        self.tiles = OrderedDict()
+
+    def invalidate(self):
+        self.tiles.clear()
+
+    def _walls_in(self, rect):
+        box = getattr(self.walls, "box_indices", None)
+        if box is None:
+            return [w for w in self.walls if rect.colliderect(w)]
+        return [self.walls[i] for i in box(rect.left, rect.top, rect.right, rect.bottom)
+                if rect.colliderect(self.walls[i])]
+
+    def _render(self, tx, ty):
+        size = self.tile
+        x0 = tx * size; y0 = ty * size
+        surf = pygame.Surface((size, size))
+        surf.fill(GRID_DARK)
+        step = BG_LINE_STEP
+        for x in range(-(-x0 // step) * step, x0 + size, step):
+            pygame.draw.line(surf, GRID_LINE, (x - x0, 0), (x - x0, size))
+        for y in range(-(-y0 // step) * step, y0 + size, step):
+            pygame.draw.line(surf, GRID_LINE, (0, y - y0), (size, y - y0))
+        area = surf.get_rect()
+        for rect in self._walls_in(pygame.Rect(x0, y0, size, size)):
+            r = rect.move(-x0, -y0)
+            surf.fill(WALL_DARK, r.clip(area))
+            # the 2 px outline as four bands: pygame.draw.rect clips the rect
+            # to the surface first and would outline the tile border instead
+            x, y, w, h = r
+            for band in ((x, y, w, 2), (x, y + h - 2, w, 2), (x, y, 2, h), (x + w - 2, y, 2, h)):
+                surf.fill(WALL_EDGE, pygame.Rect(band).clip(r).clip(area))
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        return surf
+
+    def _get(self, key):
+        surf = self.tiles.get(key)
+        if surf is None:
+            surf = self._render(*key)
+            self.tiles[key] = surf
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return surf
+
+    def draw(self, surface, walls, cam=(0, 0)):
+        """Blit the tiles under the view of ``surface`` at camera ``cam``."""
+
+        if walls is not self.walls:
+            self.walls = walls
+            self.invalidate()
+        size = self.tile
+        cx, cy = int(cam[0]), int(cam[1])
+        w, h = surface.get_size()
+        for tx in range(cx // size, (cx + w - 1) // size + 1):
+            for ty in range(cy // size, (cy + h - 1) // size + 1):
+                surface.blit(self._get((tx, ty)), (tx * size - cx, ty * size - cy))
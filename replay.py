@@ -0,0 +1,259 @@
+"""Recording of played rounds and deterministic headless replay.
+
+A :class:`sim.Simulation` only depends on its seed, the player input of every
+tick and the configuration, so that is all a replay log stores.  Replaying
+feeds the recorded input back into a fresh simulation as fast as the CPU
+allows, which turns a slow live session into a trace that can be profiled or
+rerun after a change::
+
+    python main.py --record session.vrp
+    python replay.py session.vrp
+    python replay.py session.vrp --profile trace.json
+
+Layout of a log::
+
+    b"VRPL"  uint16 version  uint32 n  n bytes of JSON meta
+    zlib stream of records, each a tag byte and a fixed size payload
+
+The meta holds the seed, team size, navigation mode and a snapshot of
+:mod:`config`.  Records are a tick with input (``I``), a tick without input
+(``T``), a round reset (``R``) and every ``checksum_every`` ticks a CRC of
+the simulation state (``C``), which replays compare against to report the
+first tick where they diverge.  The stream is flushed at every checksum so a
+log cut short by a crash is readable up to its last one.
+"""
+
+import argparse, json, os, struct, sys, time, zlib
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import config
+from config import REPLAY_CHECKSUM_TICKS, WEAPONS
+
+MAGIC = b"VRPL"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+# dt, move x/y, aim x/y, fire|revive<<1|plant<<2, weapon index or NO_BUY
+INPUT = struct.Struct("<dbbddBB")
+TICK = struct.Struct("<d")
+CHECK = struct.Struct("<II")
+NO_BUY = 0xFF
+SIZES = {b"I": INPUT.size, b"T": TICK.size, b"R": 0, b"C": CHECK.size}
+WEAPON_NAMES = list(WEAPONS)
+
+
+class ReplayError(Exception):
+    """The log cannot be read."""
+
+
+class ReplayDivergence(Exception):
+    """A replayed simulation no longer matches the recorded checksums."""
+
+    def __init__(self, tick, expected, actual):
+        super().__init__(f"state diverged at tick {tick}: expected {expected:08x}, got {actual:08x}")
+        self.tick = tick
+        self.expected = expected
+        self.actual = actual
+
+
+def config_snapshot():
+    """The JSON representable settings of :mod:`config`."""
+
+    snap = {}
+    for key, value in vars(config).items():
+        if key.isupper():
+            try:
+                snap[key] = json.loads(json.dumps(value))
+            except (TypeError, ValueError):
+                pass
+    return snap
+
+
+def state_checksum(sim):
+    """CRC32 over the clock, agents, bullets and bomb of ``sim``."""
+
+    crc = zlib.crc32(struct.pack("<Id", sim.tick, float(sim.now)))
+    for a in sim.attackers + sim.defenders:
+        crc = zlib.crc32(struct.pack("<dddBB", a.x, a.y, a.hp, a.alive, a.downed), crc)
+    pool = sim.bullets
+    live = pool.alive
+    crc = zlib.crc32(pool.x[live].tobytes(), crc)
+    crc = zlib.crc32(pool.y[live].tobytes(), crc)
+    return zlib.crc32(sim.bomb.state.encode(), crc)
+
+
+class Recorder:
+    """Writes the replay log of ``sim`` to ``path``.
+
+    Attach it to a simulation that has not ticked yet; it stays attached as
+    ``sim.recorder`` and is called from :meth:`sim.Simulation.step` and
+    :meth:`sim.Simulation.reset`.  Call :meth:`close` when the session ends.
+    """
+
+    def __init__(self, path, sim, checksum_every=REPLAY_CHECKSUM_TICKS):
+        if sim.tick:
+            raise ValueError("recording has to start before the first tick")
+        if sim.world is not None:
+            raise ValueError("only rounds on the built-in map can be recorded")
+        if not sim.scheduler.deterministic:
+            raise ValueError("recording needs a deterministic AI scheduler (no budget_ms)")
+        if sim.paths is not None:
+            raise ValueError("recording needs synchronous path planning (no path pool)")
+        self.checksum_every = checksum_every
+        meta = {
+            "seed": sim.seed,
+            "with_player": sim.with_player,
+            "team_size": sim.team_size,
+            "nav_mode": sim.nav_mode,
+            "start_ms": sim.now,
+            "checksum_every": checksum_every,
+            "config": config_snapshot(),
+        }
+        blob = json.dumps(meta).encode()
+        self.fh = open(path, "wb")
+        self.fh.write(HEADER.pack(MAGIC, VERSION, len(blob)) + blob)
+        self.z = zlib.compressobj(9)
+        sim.recorder = self
+
+    def _write(self, data, flush=False):
+        out = self.z.compress(data)
+        if flush:
+            out += self.z.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            self.fh.write(out)
+
+    def on_tick(self, sim, dt_ms, inp):
+        if inp is None:
+            self._write(b"T" + TICK.pack(dt_ms))
+        else:
+            flags = bool(inp.fire) | bool(inp.revive) << 1 | bool(inp.plant) << 2
+            buy = NO_BUY if inp.buy is None else WEAPON_NAMES.index(inp.buy)
+            self._write(b"I" + INPUT.pack(dt_ms, int(inp.move_x), int(inp.move_y),
+                                          inp.aim[0], inp.aim[1], flags, buy))
+        if self.checksum_every and sim.tick % self.checksum_every == 0:
+            self._write(b"C" + CHECK.pack(sim.tick, state_checksum(sim)), flush=True)
+
+    def on_reset(self, sim):
+        self._write(b"R")
+
+    def close(self):
+        if self.fh.closed:
+            return
+        self.fh.write(self.z.flush())
+        self.fh.close()
+
+
+def load(path):
+    """Meta dict and the decompressed record stream of the log at ``path``."""
+
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < HEADER.size:
+        raise ReplayError(f"{path}: not a replay log")
+    magic, version, n = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ReplayError(f"{path}: not a replay log")
+    if version != VERSION:
+        raise ReplayError(f"{path}: log version {version}, expected {VERSION}")
+    meta = json.loads(data[HEADER.size:HEADER.size + n])
+    # decompressobj also reads a stream that ends at a sync point
+    records = zlib.decompressobj().decompress(data[HEADER.size + n:])
+    return meta, records
+
+
+def config_changes(meta):
+    """Settings whose value differs from the recording, as ``{name: (then, now)}``."""
+
+    then = meta["config"]
+    now = config_snapshot()
+    return {k: (then.get(k), now.get(k)) for k in then.keys() | now.keys() if then.get(k) != now.get(k)}
+
+
+def replay(path, verify=True, on_tick=None):
+    """Run the log at ``path`` headlessly and return a summary dict.
+
+    With ``verify`` a checksum mismatch raises :class:`ReplayDivergence`.
+    ``on_tick(sim)`` is called after every replayed tick.
+    """
+
+    from sim import Simulation, PlayerInput
+
+    meta, records = load(path)
+    sim = Simulation(seed=meta["seed"], with_player=meta["with_player"],
+                     team_size=meta["team_size"], nav_mode=meta["nav_mode"])
+    sim.clock.now = meta["start_ms"]
+    ticks = checked = 0
+    pos = 0; end = len(records)
+    start = time.perf_counter()
+    while pos < end:
+        tag = records[pos:pos + 1]; pos += 1
+        size = SIZES.get(tag)
+        if size is None:
+            raise ReplayError(f"{path}: bad record {tag!r} at offset {pos - 1}")
+        if pos + size > end:
+            break  # the log was cut short
+        if tag == b"I":
+            dt, mx, my, ax, ay, flags, buy = INPUT.unpack_from(records, pos); pos += INPUT.size
+            inp = PlayerInput(mx, my, (ax, ay), bool(flags & 1), bool(flags & 2), bool(flags & 4),
+                              None if buy == NO_BUY else WEAPON_NAMES[buy])
+            sim.step(dt, inp)
+        elif tag == b"T":
+            (dt,) = TICK.unpack_from(records, pos); pos += TICK.size
+            sim.step(dt)
+        elif tag == b"R":
+            sim.reset()
+            continue
+        elif tag == b"C":
+            tick, crc = CHECK.unpack_from(records, pos); pos += CHECK.size
+            actual = state_checksum(sim)
+            if verify and (tick != sim.tick or crc != actual):
+                raise ReplayDivergence(tick, crc, actual)
+            checked += 1
+            continue
+        ticks += 1
+        if on_tick is not None:
+            on_tick(sim)
+    elapsed = time.perf_counter() - start
+    return {
+        "ticks": ticks,
+        "game_ms": sim.now - meta["start_ms"],
+        "checksum": state_checksum(sim),
+        "checksums": checked,
+        "seconds": elapsed,
+        "winner": sim.winner,
+        "reason": sim.reason,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded round headlessly at full speed.")
+    parser.add_argument("log")
+    parser.add_argument("--no-verify", action="store_true", help="do not stop at checksum mismatches")
+    parser.add_argument("--profile", default=None, metavar="TRACE", help="write a Chrome trace of the replay")
+    args = parser.parse_args(argv)
+
+    meta, _ = load(args.log)
+    changed = config_changes(meta)
+    if changed:
+        print("config differs from the recording: " + ", ".join(sorted(changed)), file=sys.stderr)
+    on_tick = None
+    if args.profile:
+        from profiler import PROFILER
+        PROFILER.enable()
+        on_tick = lambda sim: PROFILER.end_frame()
+    try:
+        summary = replay(args.log, not args.no_verify, on_tick)
+    except ReplayDivergence as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        if args.profile:
+            PROFILER.export_chrome(args.profile)
+    print(json.dumps(summary, indent=2))
+    print(f"{summary['ticks']} ticks in {summary['seconds']:.2f}s "
+          f"({summary['ticks'] / max(summary['seconds'], 1e-9):.0f} ticks/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Time-sliced scheduling of bot decisions.
+
+:func:`ai.bot_ai` used to pick a target, scan for downed allies and replan for
+every bot on every tick, although those decisions rarely change from one tick
+to the next.  :class:`AIScheduler` runs the expensive half, :func:`ai.bot_think`,
+only every ``think_ticks`` ticks per bot and the cheap half, :func:`ai.bot_steer`,
+on every tick:
+
+* Thinks are staggered: after its first think a bot's next one is offset by
+  its position in the team, so roughly ``1 / think_ticks`` of the bots think
+  on any tick instead of all of them every ``think_ticks`` ticks.
+* Bots farther than ``lod_dist`` from every living enemy and from the bomb
+  zone think ``lod_factor`` times less often.
+* Bots without a decision yet, or whose chosen enemy died or whose downed ally
+  got up, think on the next tick regardless of their slot.
+* At most ``max_thinks`` bots think per tick, the most overdue first; the rest
+  stay due.  With ``budget_ms`` the budget covers a whole frame, which may
+  run several ticks (see :meth:`sim.Simulation.advance`, which calls
+  :meth:`AIScheduler.begin_frame`).  The cap then also follows a running
+  average of the cost of one think so the thinks fit into what is left of
+  the budget, and a frame that runs over stops handing out thinks.  At least
+  one bot thinks per frame.
+
+Without ``budget_ms`` the schedule only depends on the simulation state, so
+rounds stay reproducible (replays and tests need that); with it, the schedule
+depends on how fast the machine is.  ``think_ticks=1`` and ``lod_factor=1``
+reproduce :func:`ai.bot_ai` on every tick exactly.
+"""
+
+import time
+
+import numpy as np
+
+from config import AI_THINK_TICKS, AI_LOD_DIST, AI_LOD_FACTOR, AI_MAX_THINKS
+from ai import bot_think, bot_steer
+from profiler import PROFILER
+
+# weight of the newest sample in the running think cost
+COST_ALPHA = 0.2
+
+
+class AIScheduler:
+    """Decides which bots think on each tick of a :class:`sim.Simulation`."""
+
+    def __init__(self, think_ticks=AI_THINK_TICKS, lod_dist=AI_LOD_DIST, lod_factor=AI_LOD_FACTOR,
+                 budget_ms=None, max_thinks=AI_MAX_THINKS):
+        if think_ticks < 1 or lod_factor < 1 or max_thinks < 1:
+            raise ValueError("think_ticks, lod_factor and max_thinks must be at least 1")
+        self.think_ticks = think_ticks
+        self.lod_dist = lod_dist
+        self.lod_factor = lod_factor
+        self.budget_ms = budget_ms
+        self.max_thinks = max_thinks
+        self.cost_ms = 0.0
+        self.spent_ms = 0.0
+        self.frame_thinks = 0
+        self.thinks = 0
+        self.next = {}
+
+    @property
+    def deterministic(self):
+        return self.budget_ms is None
+
+    def reset(self):
+        """Forget the schedule; called when a new round starts."""
+
+        self.next.clear()
+        self.begin_frame()
+
+    def begin_frame(self):
+        """Start a new frame's ``budget_ms``.
+
+        :meth:`sim.Simulation.advance` calls this; code that drives a budgeted
+        scheduler through :meth:`sim.Simulation.step` calls it once per frame.
+        """
+
+        self.spent_ms = 0.0
+        self.frame_thinks = 0
+
+    def _within_budget(self):
+        return self.budget_ms is None or not self.frame_thinks or self.spent_ms < self.budget_ms
+
+    def _cap(self):
+        if self.budget_ms is None or self.cost_ms <= 0:
+            return self.max_thinks
+        left = int((self.budget_ms - self.spent_ms) / self.cost_ms)
+        return max(0 if self.frame_thinks else 1, min(self.max_thinks, left))
+
+    @staticmethod
+    def _stale(nav):
+        if "target" not in nav:
+            return True
+        enemy = nav.get("enemy")
+        if enemy is not None and not enemy.alive:
+            return True
+        downed = nav.get("revive")
+        return downed is not None and not downed.downed
+
+    def _interval(self, agent, enemies, bomb):
+        if self.lod_factor == 1 or self.lod_dist is None:
+            return self.think_ticks
+        d2 = self.lod_dist * self.lod_dist
+        zx, zy = bomb.zone_center
+        if (agent.x - zx) ** 2 + (agent.y - zy) ** 2 <= d2:
+            return self.think_ticks
+        if len(enemies) and (((enemies - (agent.x, agent.y)) ** 2).sum(axis=1) <= d2).any():
+            return self.think_ticks
+        return self.think_ticks * self.lod_factor
+
+    def run(self, sim, bots):
+        """One tick of ``bots``, a list of ``(agent, enemies, friends, nav, neighbours)``."""
+
+        tick = sim.tick
+        nxt = self.next
+        due = []
+        for i, (agent, _, _, nav, _) in enumerate(bots):
+            if not agent.alive or agent.downed:
+                continue
+            at = nxt.get(agent)
+            if self._stale(nav):
+                due.append((float("-inf"), i))
+            elif at is None or at <= tick:
+                due.append((tick if at is None else at, i))
+        due.sort()
+        chosen = {i for _, i in due[:self._cap()]}
+        self.thinks = 0
+        positions = {}
+        if chosen:
+            for team, agents in (("ATT", sim.attackers), ("DEF", sim.defenders)):
+                positions[team] = np.array([(a.x, a.y) for a in agents if a.alive], dtype=float).reshape(-1, 2)
+        timed = self.budget_ms is not None
+        for i, (agent, enemies, friends, nav, neighbours) in enumerate(bots):
+            if i in chosen and self._within_budget():
+                start = time.perf_counter() if timed else 0.0
+                bot_think(agent, enemies, friends, sim.walls, sim.grid, nav, sim.bomb, sim.perception, neighbours,
+                          sim.paths)
+                if timed:
+                    ms = 1000 * (time.perf_counter() - start)
+                    self.spent_ms += ms
+                    self.cost_ms += COST_ALPHA * (ms - self.cost_ms) if self.cost_ms else ms
+                interval = self._interval(agent, positions["DEF" if agent.team == "ATT" else "ATT"], sim.bomb)
+                # the first think places the bot in its slot of the stagger
+                nxt[agent] = tick + (1 + i % interval if agent not in nxt else interval)
+                self.thinks += 1
+                self.frame_thinks += 1
+            bot_steer(agent, enemies, friends, sim.walls, sim.bullets, sim.grid, nav, sim.bomb,
+                      sim.perception, neighbours, sim.paths)
+        PROFILER.count("ai.thinks", self.thinks)
@@ -0,0 +1,539 @@
+"""Headless round simulation.
+
+All game rules that used to live inside the ``main()`` loop are collected here
+so a round can be advanced tick by tick without a display, an event pump or
+wall time.  ``main.py`` feeds player input into a :class:`Simulation` and only
+takes care of drawing; tools can drive the same class with a
+:class:`gameclock.ManualClock` to run rounds as fast as the CPU allows.
+"""
+
+import atexit, math, random
+from concurrent.futures import ThreadPoolExecutor
+
+import gameclock
+from config import (
+    WIDTH,
+    HEIGHT,
+    TICK_MS,
+    MAX_TICKS_PER_FRAME,
+    REVIVE_MS,
+    REVIVE_RANGE,
+    PLANT_MS,
+    DEFUSE_MS,
+    BLEEDOUT_MS,
+    BOMB_TIMER_MS,
+    BOMB_RADIUS_MIN,
+    BOMB_RADIUS_MAX,
+    TEAM_SIZE,
+    SPAWN_SPACING,
+    BLUE,
+    RED,
+    BLUE_BOT,
+    RED_BOT,
+    NAV_MODE,
+)
+from map import build_static_map, build_grid, cell_center, pos_to_cell, nearest_passable_cell
+from spatial import AgentGrid
+import clearance, hpa, jps
+from clearance import clearance_for
+from entities import Agent, BombState, BulletPool
+from ai import astar, FLOW_FIELDS
+from scheduler import AIScheduler
+from pathpool import PathPool
+from perception import Perception
+from profiler import PROFILER
+from economy import start_buy_phase, buy
+
+# banner shown for each (winner, reason) pair
+RESULT_TEXT = {
+    ("DEF", "eliminated"): "DEFENDERS WIN — Attackers eliminated",
+    ("ATT", "eliminated"): "ATTACKERS WIN — Defenders eliminated",
+    ("ATT", "all_down"): "ATTACKERS WIN — All defenders down",
+    ("ATT", "exploded"): "ATTACKERS WIN — Bomb exploded",
+    ("DEF", "defused"): "DEFENDERS WIN — Bomb defused",
+}
+
+
+def random_zone(grid, rng=random):
+    """Bomb zone centre and radius (in cells) with only walkable cells inside.
+
+    Grids with bomb sites of their own (:class:`chunks.ChunkGrid`) get the
+    zone on one of them, shrunk until it fits.
+    """
+    radius=rng.randint(BOMB_RADIUS_MIN,BOMB_RADIUS_MAX)
+    sites=getattr(grid,'sites',None)
+    if sites is not None:
+        centre=sites[rng.choice(sorted(sites))]
+        while radius>0 and not _disk_walkable(grid, centre, radius):
+            radius-=1
+        if radius==0:
+            raise ValueError(f"no room for a bomb zone at site {centre}")
+        return cell_center(*centre), radius
+    centre=clearance_for(grid).random_centre(radius, rng)
+    if centre is None:
+        raise ValueError(f"no room for a bomb zone of radius {radius}")
+    return cell_center(*centre), radius
+
+def _disk_walkable(grid, centre, radius):
+    cx,cy=centre
+    for dx in range(-radius,radius+1):
+        for dy in range(-radius,radius+1):
+            if dx*dx+dy*dy<=radius*radius:
+                x=cx+dx; y=cy+dy
+                if not (0<=x<len(grid) and 0<=y<len(grid[0]) and grid[x][y]):
+                    return False
+    return True
+
+def _make_nav():
+    return {"path": None, "goal": None, "idx": 0, "last_compute": 0}
+
+def _get_nav(navs, agent):
+    # ensure a nav entry exists for this agent object
+    if agent not in navs:
+        navs[agent] = _make_nav()
+    return navs[agent]
+
+def spawn_points(grid, origin, direction, n, spacing=SPAWN_SPACING):
+    """``n`` spawn positions fanning out from ``origin`` along ``direction``.
+
+    Points lie on a square lattice, diagonal first, so the first four are the
+    classic 4v4 line.  Points whose cell is blocked in ``grid`` are skipped.
+    """
+
+    ox, oy = origin; dx, dy = direction
+    width, height = getattr(grid, 'bounds', (WIDTH, HEIGHT))
+    k = max(4, math.isqrt(max(n - 1, 0)) + 1)
+    while k * spacing <= max(width, height):
+        lattice = sorted(((c, r) for c in range(k) for r in range(k)),
+                         key=lambda p: (abs(p[0] - p[1]), p[0] + p[1], p[0]))
+        out = []
+        for c, r in lattice:
+            x = ox + dx * spacing * c; y = oy + dy * spacing * r
+            if 0 < x < width and 0 < y < height:
+                col, row = pos_to_cell((x, y), grid)
+                if grid[col][row]:
+                    out.append((x, y))
+                    if len(out) == n:
+                        return out
+        k += 1
+    raise ValueError(f"no room for {n} spawns at {origin}")
+
+def spawn_origins(grid, zone_center):
+    """``(origin, direction)`` of the attackers' and the defenders' spawns.
+
+    On the built-in map the teams start in opposite corners.  Grids with bomb
+    sites start the attackers at the site farthest from the zone and the
+    defenders on the zone, each fanning out towards the other.
+    """
+
+    sites = getattr(grid, 'sites', None)
+    if sites is None:
+        width, height = getattr(grid, 'bounds', (WIDTH, HEIGHT))
+        return ((200, height - 200), (1, -1)), ((width - 200, 200), (-1, 1))
+    zx, zy = zone_center
+    ax, ay = max((cell_center(*c) for c in sites.values()),
+                 key=lambda p: (p[0] - zx) ** 2 + (p[1] - zy) ** 2)
+    towards = (1 if zx >= ax else -1, 1 if zy >= ay else -1)
+    return ((ax, ay), towards), ((zx, zy), (-towards[0], -towards[1]))
+
+_static_world = None
+
+def static_world():
+    """Walls and walkability grid of the built-in map, built once per process."""
+
+    global _static_world
+    if _static_world is None:
+        walls=build_static_map()
+        _static_world=(walls, build_grid(walls))
+    return _static_world
+
+def reset_round(rng=random, with_player=True, world=None, team_size=TEAM_SIZE):
+    """Build both teams for a fresh round.
+
+    With ``with_player=False`` every agent is a bot, which is what headless
+    tools use.  ``world`` may pass a prebuilt ``(walls, grid)`` pair, such
+    as the chunked proxies of a :class:`chunks.ChunkWorld`; by default the
+    built-in map from :func:`static_world` is reused.  Each team gets
+    ``team_size`` agents.
+    """
+
+    walls, grid = world if world is not None else static_world()
+    zone_center, radius = random_zone(grid, rng)
+    bomb=BombState(zone_center, radius)
+    player_team=rng.choice(["ATT","DEF"])
+    att_origin, def_origin = spawn_origins(grid, zone_center)
+    att_spawns=spawn_points(grid,*att_origin,team_size)
+    def_spawns=spawn_points(grid,*def_origin,team_size)
+    attackers=[]; defenders=[]
+    if not with_player:
+        for i in range(team_size): attackers.append(Agent(*att_spawns[i], BLUE_BOT if i else BLUE, "ATT", name=f"ATT-{i+1}"))
+        for i in range(team_size): defenders.append(Agent(*def_spawns[i], RED_BOT if i else RED, "DEF", name=f"DEF-{i+1}"))
+    elif player_team=="ATT":
+        attackers.append(Agent(*att_spawns[0], BLUE, "ATT", True, "YOU"))
+        for i in range(1,team_size): attackers.append(Agent(*att_spawns[i], BLUE_BOT, "ATT", name=f"ALLY-{i}"))
+        for i in range(team_size): defenders.append(Agent(*def_spawns[i], RED_BOT if i else RED, "DEF", name=f"ENEMY-{i+1}"))
+    else:
+        defenders.append(Agent(*def_spawns[0], RED, "DEF", True, "YOU"))
+        for i in range(1,team_size): defenders.append(Agent(*def_spawns[i], RED_BOT, "DEF", name=f"ALLY-{i}"))
+        for i in range(team_size): attackers.append(Agent(*att_spawns[i], BLUE_BOT if i else BLUE, "ATT", name=f"ENEMY-{i+1}"))
+    navs = {a: _make_nav() for a in attackers + defenders if not a.is_player}
+    return walls,grid,bomb,attackers,defenders,navs
+
+def prepare_round(rng=random, with_player=True, world=None, team_size=TEAM_SIZE, nav_mode=None, planner=None):
+    """:func:`reset_round` plus the navigation state bots start the round with.
+
+    Bots planning with A* all head for the bomb zone on their first tick, so
+    that path is computed here and left in the bot's nav entry; the bot uses
+    it if its first plan really asks for the same start and goal.  With a
+    :class:`pathpool.PathPool` in ``planner`` the paths are planned by its
+    worker processes, which keeps a background preparation from competing
+    with the game loop for the interpreter.  Only ``rng`` and the arguments
+    are read, so the result is the same whether the round is prepared ahead
+    of time on another thread or on demand.
+    """
+
+    walls,grid,bomb,attackers,defenders,navs = reset_round(rng, with_player, world, team_size)
+    chunked = getattr(grid, "chunked", False)
+    if chunked and (nav_mode or NAV_MODE) != "astar":
+        raise ValueError("bots on chunked worlds plan with astar")
+    if nav_mode:
+        for nav in navs.values():
+            nav["mode"] = nav_mode
+    if (nav_mode or NAV_MODE) == "astar":
+        goal = nearest_passable_cell(grid, pos_to_cell(bomb.zone_center, grid))
+        if goal is not None:
+            pairs = [(pos_to_cell(agent.pos, grid), goal) for agent in navs]
+            if planner is not None and not chunked:
+                planner.bind(grid)
+                paths = planner.plan_many("astar", pairs)
+            else:
+                paths = [astar(grid, *pair) for pair in pairs]
+            for nav, pair, path in zip(navs.values(), pairs, paths):
+                nav["warm"] = pair + (path,)
+    return walls,grid,bomb,attackers,defenders,navs
+
+# one worker thread preparing upcoming rounds for every Simulation, and the
+# worker processes it plans their first paths with
+_preparer = None
+_planner = None
+
+def _round_preparer():
+    global _preparer
+    if _preparer is None:
+        _preparer = ThreadPoolExecutor(1, thread_name_prefix="round-prep")
+    return _preparer
+
+def _round_planner():
+    global _planner
+    if _planner is None:
+        _planner = PathPool()
+        atexit.register(_planner.close)
+    return _planner
+
+def alive(lst): return [a for a in lst if a.alive]
+def active_or_downed(lst): return [a for a in lst if (a.alive or a.downed)]
+
+def round_result(bomb, attackers, defenders):
+    """Return ``(winner, reason)`` if the round is decided, otherwise ``None``."""
+
+    att_out = not alive(attackers) and all(not a.downed for a in attackers)
+    def_out = not alive(defenders) and all(not d.downed for d in defenders)
+    if bomb.state=='idle':
+        if att_out:
+            return "DEF", "eliminated"
+        if def_out:
+            return "ATT", "eliminated"
+    elif bomb.state=='exploded':
+        return "ATT", "exploded"
+    elif bomb.state=='defused':
+        return "DEF", "defused"
+    elif def_out:
+        return "ATT", "all_down"
+    return None
+
+
+class PlayerInput:
+    """Player controls sampled for a single tick.
+
+    ``move_x``/``move_y`` are -1, 0 or 1, ``aim`` is the mouse position in
+    world coordinates and ``buy`` optionally names an item to purchase.
+    """
+
+    __slots__ = ("move_x", "move_y", "aim", "fire", "revive", "plant", "buy")
+
+    def __init__(self, move_x=0, move_y=0, aim=(0, 0), fire=False,
+                 revive=False, plant=False, buy=None):
+        self.move_x, self.move_y = move_x, move_y
+        self.aim = aim
+        self.fire = fire
+        self.revive = revive
+        self.plant = plant
+        self.buy = buy
+
+
+class Simulation:
+    """One round of the game advanced with :meth:`step`.
+
+    The simulation owns its clock.  It defaults to a
+    :class:`gameclock.ManualClock` so that ``step(dt_ms)`` moves time forward
+    by exactly ``dt_ms``; the interactive game keeps that clock too and feeds
+    it real frame times through :meth:`advance`.
+
+    ``team_size`` sets the number of agents per team and ``nav_mode``
+    overrides ``NAV_MODE`` for every bot; large rounds want ``"flowfield"``.
+
+    Without a ``seed`` one is drawn at random and kept in ``seed`` so the
+    round can be replayed.  A ``recorder`` (see :mod:`replay`) attached to a
+    fresh simulation is told about every tick and every reset.
+
+    With ``prefetch`` the next round is prepared on a background thread while
+    the current one plays, and :meth:`reset` swaps it in; the first paths of
+    its bots are planned in worker processes.  Rounds come out the same as
+    without it.
+
+    Bot decisions are spread over ticks by ``scheduler``, a
+    :class:`scheduler.AIScheduler`; the default one is deterministic.  With
+    a :class:`pathpool.PathPool` in ``paths`` bots plan their paths in the
+    background, which makes the round depend on timing.
+    """
+
+    def __init__(self, seed=None, clock=None, with_player=True, world=None,
+                 team_size=TEAM_SIZE, nav_mode=None, prefetch=False, scheduler=None,
+                 paths=None):
+        self.clock = clock if clock is not None else gameclock.ManualClock()
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = random.Random(self.seed)
+        self.recorder = None
+        self.with_player = with_player
+        self.world = world
+        self.team_size = team_size
+        self.nav_mode = nav_mode
+        self.prefetch = prefetch
+        self.next_round = None
+        self.scheduler = scheduler if scheduler is not None else AIScheduler()
+        self.paths = paths
+        self.reset()
+
+    def _prepare(self, planner=None):
+        return prepare_round(self.rng, self.with_player, self.world, self.team_size, self.nav_mode, planner)
+
+    def reset(self):
+        gameclock.install(self.clock)
+        if self.next_round is not None:
+            # waits only if the worker has not finished yet
+            prepared = self.next_round.result()
+        else:
+            prepared = self._prepare()
+        (self.walls, self.grid, self.bomb, self.attackers, self.defenders,
+         self.navs) = prepared
+        # shared with other rounds until set_walkable copies it
+        self.own_grid = False
+        # the rng is only drawn from while preparing, so the worker may use it
+        self.next_round = _round_preparer().submit(self._prepare, _round_planner()) if self.prefetch else None
+        self.neighbours = {"ATT": AgentGrid(), "DEF": AgentGrid()}
+        self.accumulator = 0.0
+        self.pending_buy = None
+        self.tick = 0
+        self.bullets = BulletPool()
+        self.perception = Perception()
+        self.scheduler.reset()
+        if self.paths is not None:
+            self.paths.clear()
+            self.paths.bind(self.grid)
+        self.round_over = False
+        self.winner = None
+        self.reason = None
+        self.winner_text = ""
+        self.stats = {"plants": 0, "defuses": 0, "revives": 0, "damage_att": 0, "damage_def": 0}
+        self.round_start = self.clock.ticks()
+        self.buy_end = start_buy_phase(self.attackers + self.defenders, None)
+        self.player = next((a for a in self.attackers + self.defenders if a.is_player), None)
+        if self.recorder is not None:
+            self.recorder.on_reset(self)
+
+    @property
+    def now(self):
+        return self.clock.ticks()
+
+    @property
+    def agents(self):
+        return self.attackers + self.defenders
+
+    def step(self, dt_ms=TICK_MS, inp=None):
+        """Advance the clock by ``dt_ms`` and run one tick of game logic."""
+
+        gameclock.install(self.clock)
+        self.clock.advance(dt_ms)
+        self.tick += 1
+        now = self.clock.ticks()
+        for a in self.attackers + self.defenders:
+            a.prev_x, a.prev_y = a.x, a.y
+        downed = [a for a in self.attackers + self.defenders if a.downed]
+        bomb_state = self.bomb.state
+        if self.player is not None and inp is not None:
+            with PROFILER.scope("sim.input"):
+                self._apply_input(self.player, inp, now)
+        with PROFILER.scope("sim.perception"):
+            self.perception.update(self.attackers, self.defenders, self.walls, now)
+            self.neighbours["ATT"].rebuild(self.attackers)
+            self.neighbours["DEF"].rebuild(self.defenders)
+        with PROFILER.scope("sim.bots"):
+            self._run_bots()
+        self.stats["revives"] += sum(1 for a in downed if a.alive)
+        if bomb_state != self.bomb.state:
+            if self.bomb.state == 'planted':
+                self.stats["plants"] += 1
+            elif self.bomb.state == 'defused':
+                self.stats["defuses"] += 1
+        with PROFILER.scope("sim.bullets"):
+            self._update_bullets()
+        with PROFILER.scope("sim.rules"):
+            self._update_bleedout(now)
+            if self.bomb.state=='planted' and now-self.bomb.planted_time >= BOMB_TIMER_MS:
+                self.bomb.state='exploded'
+            if not self.round_over:
+                result = round_result(self.bomb, self.attackers, self.defenders)
+                if result is not None:
+                    self.round_over = True
+                    self.winner, self.reason = result
+                    self.winner_text = RESULT_TEXT[result]
+        if self.recorder is not None:
+            self.recorder.on_tick(self, dt_ms, inp)
+
+    def advance(self, frame_ms, inp=None, max_steps=MAX_TICKS_PER_FRAME):
+        """Run as many fixed ``TICK_MS`` ticks as ``frame_ms`` of real time covers.
+
+        Time left over carries into the next call.  At most ``max_steps``
+        ticks run per call and a larger backlog is dropped, so a stall slows
+        the game down instead of freezing the display while it catches up.
+        A purchase in ``inp.buy`` is applied on the first tick that runs.
+        Returns how far the clock is into the next tick (0 to 1), the factor
+        to interpolate drawn positions with.
+        """
+
+        if inp is not None and inp.buy is not None:
+            self.pending_buy = inp.buy
+        self.accumulator += frame_ms
+        # the AI budget covers all ticks of this frame
+        self.scheduler.begin_frame()
+        steps = 0
+        while self.accumulator >= TICK_MS and steps < max_steps:
+            if inp is not None:
+                inp.buy, self.pending_buy = self.pending_buy, None
+            self.step(TICK_MS, inp)
+            self.accumulator -= TICK_MS
+            steps += 1
+        if self.accumulator >= TICK_MS:
+            self.accumulator %= TICK_MS
+        return self.accumulator / TICK_MS
+
+    def run_round(self, dt_ms=TICK_MS, max_ms=None):
+        """Step bot-only play until the round is decided or ``max_ms`` passes."""
+
+        while not self.round_over:
+            if max_ms is not None and self.now - self.round_start >= max_ms:
+                break
+            self.step(dt_ms)
+        return self.round_over
+
+    def set_walkable(self, cells, walkable):
+        """Open (``walkable=True``) or block ``cells`` of the grid mid round.
+
+        The round's grid is usually the one :func:`static_world` shares with
+        every other round in the process, so the first change of a round
+        copies it; later rounds start from the unchanged map again.  After
+        that the copy is changed in place and everything derived from it
+        follows: the shared HPA* planner and every bot's D* Lite tree are
+        repaired incrementally (or rebuilt for the copy), the JPS tables, flow
+        fields and clearance map are rebuilt on their next use and a path
+        pool restarts its workers and plans its pending requests again.
+        """
+
+        if getattr(self.grid, "chunked", False):
+            raise TypeError("chunked grids are generated, not edited")
+        if not self.own_grid:
+            self.grid = [list(col) for col in self.grid]
+            self.own_grid = True
+        cells = list(cells)
+        for c, r in cells:
+            self.grid[c][r] = walkable
+        hpa.cells_changed(self.grid, cells)
+        jps.cells_changed(self.grid, cells)
+        FLOW_FIELDS.cells_changed(self.grid, cells)
+        clearance.cells_changed(self.grid, cells)
+        for nav in self.navs.values():
+            planner = nav.get('planner')
+            if planner is not None and planner.grid is self.grid:
+                planner.update_cells(cells)
+        if self.paths is not None:
+            self.paths.refresh(self.grid)
+
+    # ------------------------------------------------------------------
+    # tick stages
+    # ------------------------------------------------------------------
+
+    def _apply_input(self, player, inp, now):
+        if inp.buy is not None:
+            buy(player, inp.buy)
+        player.move_input(inp.move_x, inp.move_y, self.walls)
+        if inp.fire:
+            player.shoot(inp.aim, now, self.bullets)
+
+        # Player revive/plant/defuse
+        bomb = self.bomb
+        if inp.revive:
+            friends = self.attackers if player.team=="ATT" else self.defenders
+            nearest=None; best=1e9
+            for fr in friends:
+                if fr.downed:
+                    d=(player.x-fr.x)**2+(player.y-fr.y)**2
+                    if d<best:
+                        best=d; nearest=fr
+            if nearest and math.hypot(player.x-nearest.x, player.y-nearest.y)<=REVIVE_RANGE:
+                if player.lock_reason is None:
+                    player.lock_reason='revive'; player.lock_start=now; player.reviving_target=nearest; nearest.pause_bleedout()
+                elif player.lock_reason=='revive' and player.reviving_target is nearest:
+                    if now-player.lock_start>=REVIVE_MS:
+                        nearest.revive(); nearest.resume_bleedout(); player.lock_reason=None; player.reviving_target=None
+            else:
+                if player.lock_reason=='revive' and player.reviving_target:
+                    player.reviving_target.resume_bleedout()
+                    player.lock_reason=None; player.reviving_target=None
+        else:
+            if player.lock_reason=='revive' and player.reviving_target:
+                player.reviving_target.resume_bleedout(); player.lock_reason=None; player.reviving_target=None
+        if inp.plant:
+            if bomb.state=='idle' and player.team=='ATT' and bomb.in_zone(player.pos):
+                if player.lock_reason is None:
+                    player.lock_reason='plant'; player.lock_start=now
+                if now-player.lock_start>=PLANT_MS:
+                    bomb.commit_plant(player.team); player.lock_reason=None
+            elif bomb.state=='planted' and player.team=='DEF' and bomb.in_zone(player.pos):
+                if player.lock_reason is None:
+                    player.lock_reason='defuse'; player.lock_start=now
+                if now-player.lock_start>=DEFUSE_MS:
+                    bomb.commit_defuse(); player.lock_reason=None
+        else:
+            if player.lock_reason in ('plant','defuse'):
+                player.lock_reason=None
+
+    def _run_bots(self):
+        bots = []
+        for side, team, enemies in (("ATT", self.attackers, self.defenders), ("DEF", self.defenders, self.attackers)):
+            for a in team:
+                if not a.is_player:
+                    bots.append((a, enemies, team, _get_nav(self.navs, a), self.neighbours[side]))
+        self.scheduler.run(self, bots)
+
+    def _update_bullets(self):
+        for team, t, dmg in self.bullets.update(self.walls, self.attackers + self.defenders):
+            if t.alive:
+                hp=t.hp
+                t.take_damage(dmg)
+                self.stats["damage_att" if team=='ATT' else "damage_def"] += hp-t.hp
+
+    def _update_bleedout(self, now):
+        for ag in self.attackers + self.defenders:
+            if ag.downed and now - ag.downed_at - ag.bleed_paused >= BLEEDOUT_MS:
+                ag.downed=False; ag.alive=False; ag.hp=0; ag.reviving_target=None
+                ag.bleed_paused=0; ag.bleed_paused_start=None
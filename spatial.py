@@ -0,0 +1,159 @@
+"""Spatial hashes over the walls of a map and over moving agents.
+
+Movement, bullets and line of sight used to test every wall for every query.
+:class:`WallIndex` is built once per map and buckets each wall into the square
+cells of side ``WALL_BUCKET`` its rect touches, so a query only looks at the
+walls registered in the few buckets around it.
+
+The index is a ``list`` subclass: code iterating over ``walls`` (rendering,
+the minimap, cache keys) keeps working unchanged.  Queries return walls in
+list order, so callers that resolve collisions one wall after another get the
+same result as a plain loop over the list.  The wall list is static; build a
+new index when the walls change.
+
+:class:`AgentGrid` is the dynamic counterpart for agents: it is rebuilt every
+tick and answers "who is near this point" for separation, revives and other
+per-agent scans that would otherwise loop over whole teams.
+"""
+
+import math
+
+from config import WALL_BUCKET, AGENT_CELL
+
+
+class WallIndex(list):
+    """Wall rects with a uniform grid of buckets for nearby-rect queries."""
+
+    def __init__(self, walls=(), bucket=WALL_BUCKET):
+        super().__init__(walls)
+        self.bucket = bucket
+        self.buckets = {}
+        for i, rect in enumerate(self):
+            x, y, w, h = rect
+            for key in self._keys(x, y, x + w, y + h):
+                self.buckets.setdefault(key, []).append(i)
+
+    def _keys(self, x0, y0, x1, y1):
+        """Bucket keys overlapping the closed box ``[x0, x1] x [y0, y1]``."""
+
+        b = self.bucket
+        bx0 = math.floor(x0 / b); bx1 = math.floor(x1 / b)
+        by0 = math.floor(y0 / b); by1 = math.floor(y1 / b)
+        return [(bx, by) for bx in range(bx0, bx1 + 1) for by in range(by0, by1 + 1)]
+
+    def _collect(self, keys):
+        buckets = self.buckets
+        found = set()
+        for key in keys:
+            found.update(buckets.get(key, ()))
+        return sorted(found)
+
+    # ------------------------------------------------------------------
+    # queries returning wall indices in list order
+    # ------------------------------------------------------------------
+
+    def box_indices(self, x0, y0, x1, y1):
+        b = self.bucket
+        bx = math.floor(x0 / b); by = math.floor(y0 / b)
+        if bx == math.floor(x1 / b) and by == math.floor(y1 / b):
+            # inside one bucket, whose list is already in wall order
+            return self.buckets.get((bx, by), [])
+        return self._collect(self._keys(x0, y0, x1, y1))
+
+    def circle_indices(self, x, y, r):
+        return self.box_indices(x - r, y - r, x + r, y + r)
+
+    def point_indices(self, x, y):
+        b = self.bucket
+        return self.buckets.get((math.floor(x / b), math.floor(y / b)), [])
+
+    def segment_indices(self, p1, p2):
+        """Walls whose rect may touch the segment ``p1``-``p2``.
+
+        Every bucket column the segment spans is walked with the part of the
+        segment inside it, so the result covers the segment's full footprint.
+        """
+
+        b = self.bucket
+        (x1, y1), (x2, y2) = p1, p2
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        bx0 = math.floor(x1 / b); bx1 = math.floor(x2 / b)
+        if bx0 == bx1:
+            return self.box_indices(x1, min(y1, y2), x2, max(y1, y2))
+        slope = (y2 - y1) / (x2 - x1)
+        keys = []
+        for bx in range(bx0, bx1 + 1):
+            xa = max(x1, bx * b); xb = min(x2, (bx + 1) * b)
+            ya = y1 + (xa - x1) * slope; yb = y1 + (xb - x1) * slope
+            lo = math.floor(min(ya, yb) / b); hi = math.floor(max(ya, yb) / b)
+            keys.extend((bx, by) for by in range(lo, hi + 1))
+            # a segment ending exactly on a bucket edge also touches the next one
+            if xb == (bx + 1) * b:
+                keys.extend((bx + 1, by) for by in range(lo, hi + 1))
+        return self._collect(keys)
+
+    # ------------------------------------------------------------------
+    # queries returning the rects themselves
+    # ------------------------------------------------------------------
+
+    def near_circle(self, x, y, r):
+        return [self[i] for i in self.circle_indices(x, y, r)]
+
+    def near_point(self, x, y):
+        return [self[i] for i in self.point_indices(x, y)]
+
+    def near_segment(self, p1, p2):
+        return [self[i] for i in self.segment_indices(p1, p2)]
+
+
+class AgentGrid:
+    """Uniform grid over agent positions for neighbour queries.
+
+    Rebuilt once per tick with :meth:`rebuild`; agents that are neither alive
+    nor downed are left out and downed agents are also kept in a table of
+    their own for revive scans.  Agents keep moving during a tick, so callers
+    pad the query radius by the distance an agent can cover in one tick and
+    then test the exact distance against live positions.  Results come back in
+    the order the agents were passed to :meth:`rebuild`.
+    """
+
+    def __init__(self, agents=(), cell=AGENT_CELL):
+        self.cell = cell
+        self.rebuild(agents)
+
+    def rebuild(self, agents):
+        c = self.cell
+        self.agents = agents
+        cells = self.cells = {}
+        downed = self.downed = {}
+        for i, a in enumerate(agents):
+            if a.alive or a.downed:
+                key = (int(a.x // c), int(a.y // c))
+                cells.setdefault(key, []).append(i)
+                if a.downed:
+                    downed.setdefault(key, []).append(i)
+
+    def _query(self, table, x, y, r):
+        if not table:
+            return []
+        c = self.cell
+        found = []
+        for cx in range(int((x - r) // c), int((x + r) // c) + 1):
+            for cy in range(int((y - r) // c), int((y + r) // c) + 1):
+                idx = table.get((cx, cy))
+                if idx:
+                    found += idx
+        found.sort()
+        agents = self.agents
+        return [agents[i] for i in found]
+
+    def near(self, x, y, r):
+        """Active agents whose cell overlaps the square of half side ``r``."""
+
+        return self._query(self.cells, x, y, r)
+
+    def near_downed(self, x, y, r):
+        """Like :meth:`near` for the agents that were downed at rebuild time."""
+
+        return self._query(self.downed, x, y, r)
@@ -0,0 +1,58 @@
+"""Shared fonts and a cache of rendered text surfaces.
+
+``pygame.font.SysFont`` looks the font up on the system and loads it, and
+``Font.render`` rasterizes the string; both used to run every frame for the
+HUD, the buy menu and every agent label.  Fonts are now loaded once per
+(size, bold) and rendered strings are kept in a bounded LRU keyed by
+(font, text, colour), so a label that did not change is a dictionary lookup.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+from config import FONT_NAME, TEXT_CACHE_SIZE
+
+_fonts = {}
+
+
+def get_font(size, bold=False):
+    """The shared ``FONT_NAME`` font of ``size`` pixels, loaded on first use."""
+
+    font = _fonts.get((size, bold))
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[(size, bold)] = pygame.font.SysFont(FONT_NAME, size, bold=bold)
+    return font
+
+
+class TextCache:
+    """LRU of rendered text surfaces."""
+
+    def __init__(self, max_items=TEXT_CACHE_SIZE):
+        self.max_items = max_items
+        self.items = OrderedDict()
+
+    def render(self, font, text, colour):
+        key = (font, text, tuple(colour))
+        surf = self.items.get(key)
+        if surf is None:
+            surf = self.items[key] = font.render(text, True, colour)
+            if len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        else:
+            self.items.move_to_end(key)
+        return surf
+
+    def clear(self):
+        self.items.clear()
+
+
+_cache = TextCache()
+
+
+def render_text(font, text, colour):
+    """Rendered ``text`` from the shared cache; do not draw onto the result."""
+
+    return _cache.render(font, text, colour)
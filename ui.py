@@ -15,74 +15,154 @@ from config import (
     HEIGHT,
     GRID,
     MINIMAP_SIZE,
+    MINIMAP_REFRESH_MS,
+    MINIMAP_ALPHA_STEP,
+    PROFILE_OVERLAY_MS,
     ENEMY_MEMORY_MS,
     WHITE,
     GREY,
     WEAPONS,
 )
+from gameclock import get_ticks
+from text import get_font, render_text
 
 
 # ---------------------------------------------------------------------------
 # Minimap
 # ---------------------------------------------------------------------------
 
-def draw_minimap(surface: pygame.Surface, player, walls, bomb, agents: Sequence) -> None:
-    """Draw a very small representation of the arena in the top right."""
+class Minimap:
+    """Minimap drawn from a cached static layer plus a throttled dot overlay.
+
+    Walls and the bomb zone are rendered once per round into ``static``; the
+    cache is rebuilt when the wall list or the zone changes.  Agent dots are
+    recomposited onto one reused surface at most every ``refresh_ms``, using
+    dot sprites pre-rendered per colour and alpha bucket.
+    """
+
+    def __init__(self, size: int = MINIMAP_SIZE, refresh_ms: int = MINIMAP_REFRESH_MS) -> None:
+        self.size = size
+        self.scale = size / WIDTH
+        self.refresh_ms = refresh_ms
+        self.static = pygame.Surface((size, size), pygame.SRCALPHA)
+        self.frame = pygame.Surface((size, size), pygame.SRCALPHA)
+        self.static_key = None
+        self.last_refresh = None
+        self.dots: dict = {}
+
+    def _build_static(self, walls, bomb) -> None:
+        scale = self.scale
+        self.static.fill((20, 20, 24))
+        for w in walls:
+            pygame.draw.rect(
+                self.static,
+                (100, 100, 100),
+                pygame.Rect(int(w.x * scale), int(w.y * scale), int(w.w * scale), int(w.h * scale)),
+            )
+        pygame.draw.circle(
+            self.static,
+            (80, 80, 120),
+            (int(bomb.zone_center[0] * scale), int(bomb.zone_center[1] * scale)),
+            int(bomb.radius * scale * GRID),
+            1,
+        )
 
-    scale = MINIMAP_SIZE / WIDTH
-    mini = pygame.Surface((MINIMAP_SIZE, MINIMAP_SIZE), pygame.SRCALPHA)
-    mini.fill((20, 20, 24))
+    def _dot(self, colour, alpha: int) -> pygame.Surface:
+        if alpha < 255:
+            alpha -= alpha % MINIMAP_ALPHA_STEP
+        key = (tuple(colour), alpha)
+        dot = self.dots.get(key)
+        if dot is None:
+            dot = pygame.Surface((6, 6), pygame.SRCALPHA)
+            pygame.draw.circle(dot, (*colour, alpha), (3, 3), 3)
+            self.dots[key] = dot
+        return dot
+
+    def _compose(self, player, agents: Sequence, now: int) -> None:
+        scale = self.scale
+        frame = self.frame
+        frame.blit(self.static, (0, 0))
+        for ag in agents:
+            if ag.team == player.team:
+                frame.blit(self._dot(ag.color, 255), (int(ag.x * scale) - 3, int(ag.y * scale) - 3))
+            else:
+                seen_time = ag.seen_by_att if player.team == "ATT" else ag.seen_by_def
+                elapsed = now - seen_time
+                if elapsed < ENEMY_MEMORY_MS:
+                    alpha = max(50, 255 - int(255 * elapsed / ENEMY_MEMORY_MS))
+                    frame.blit(self._dot(ag.color, alpha), (int(ag.x * scale) - 3, int(ag.y * scale) - 3))
+
+    def draw(self, surface: pygame.Surface, player, walls, bomb, agents: Sequence) -> None:
+        """Draw the minimap in the top right of ``surface``."""
+
+        now = get_ticks()
+        key = (id(walls), tuple(bomb.zone_center), bomb.radius)
+        stale = key != self.static_key
+        if stale:
+            self._build_static(walls, bomb)
+            self.static_key = key
+        if stale or self.last_refresh is None or now - self.last_refresh >= self.refresh_ms:
+            self._compose(player, agents, now)
+            self.last_refresh = now
+        surface.blit(self.frame, (surface.get_width() - self.size - 20, 20))
+
+
+_minimap = None
 
-    for w in walls:
-        pygame.draw.rect(
-            mini,
-            (100, 100, 100),
-            pygame.Rect(int(w.x * scale), int(w.y * scale), int(w.w * scale), int(w.h * scale)),
-        )
 
-    pygame.draw.circle(
-        mini,
-        (80, 80, 120),
-        (int(bomb.zone_center[0] * scale), int(bomb.zone_center[1] * scale)),
-        int(bomb.radius * scale * GRID),
-        1,
-    )
-
-    now = pygame.time.get_ticks()
-    for ag in agents:
-        if ag.team == player.team:
-            pygame.draw.circle(mini, ag.color, (int(ag.x * scale), int(ag.y * scale)), 3)
-        else:
-            seen_time = ag.seen_by_att if player.team == "ATT" else ag.seen_by_def
-            elapsed = now - seen_time
-            if elapsed < ENEMY_MEMORY_MS:
-                alpha = max(50, 255 - int(255 * elapsed / ENEMY_MEMORY_MS))
-                dot = pygame.Surface((6, 6), pygame.SRCALPHA)
-                pygame.draw.circle(dot, (*ag.color, alpha), (3, 3), 3)
-                mini.blit(dot, (int(ag.x * scale) - 3, int(ag.y * scale) - 3))
-
-    surface.blit(mini, (surface.get_width() - MINIMAP_SIZE - 20, 20))
+def draw_minimap(surface: pygame.Surface, player, walls, bomb, agents: Sequence) -> None:
+    """Draw a very small representation of the arena in the top right."""
+
+    global _minimap
+    if _minimap is None:
+        _minimap = Minimap()
+    _minimap.draw(surface, player, walls, bomb, agents)
 
 
 # ---------------------------------------------------------------------------
 # Buy menu
 # ---------------------------------------------------------------------------
 
-def draw_buy_menu(surface: pygame.Surface, agent) -> None:
-    """Render a very small textual buy menu in the centre of ``surface``."""
+class BuyMenu:
+    """Buy menu panel, re-rendered only when the affordable weapons change."""
+
+    def __init__(self) -> None:
+        self.panel = None
+        self.key = None
+
+    def _build(self, affordable) -> pygame.Surface:
+        font = get_font(18)
+        panel = pygame.Surface((360, 260))
+        panel.fill((16, 16, 18))
+        pygame.draw.rect(panel, (60, 60, 60), panel.get_rect(), 2)
+
+        for i, ((name, data), ok) in enumerate(zip(WEAPONS.items(), affordable), start=1):
+            text = f"{i}. {name} [{data['price']}]"
+            colour = WHITE if ok else GREY
+            panel.blit(render_text(font, text, colour), (12, 12 + (i - 1) * 22))
+        return panel
 
-    font = pygame.font.SysFont("consolas", 18)
-    panel = pygame.Surface((360, 260))
-    panel.fill((16, 16, 18))
-    pygame.draw.rect(panel, (60, 60, 60), panel.get_rect(), 2)
+    def draw(self, surface: pygame.Surface, agent) -> None:
+        """Render the menu in the centre of ``surface``."""
 
-    for i, (name, data) in enumerate(WEAPONS.items(), start=1):
-        price = data["price"]
-        text = f"{i}. {name} [{price}]"
-        colour = WHITE if agent.credits >= price else GREY
-        panel.blit(font.render(text, True, colour), (12, 12 + (i - 1) * 22))
+        # credits only matter where they cross a price
+        key = tuple(agent.credits >= data["price"] for data in WEAPONS.values())
+        if key != self.key:
+            self.panel = self._build(key)
+            self.key = key
+        surface.blit(self.panel, (surface.get_width() // 2 - 180, surface.get_height() // 2 - 130))
 
-    surface.blit(panel, (surface.get_width() // 2 - 180, surface.get_height() // 2 - 130))
+
+_buy_menu = None
+
+
+def draw_buy_menu(surface: pygame.Surface, agent) -> None:
+    """Render a very small textual buy menu in the centre of ``surface``."""
+
+    global _buy_menu
+    if _buy_menu is None:
+        _buy_menu = BuyMenu()
+    _buy_menu.draw(surface, agent)
 
 
 # ---------------------------------------------------------------------------
@@ -90,6 +170,56 @@ def draw_buy_menu(surface: pygame.Surface, agent) -> None:
 # ---------------------------------------------------------------------------
 
 def draw_hud(surface: pygame.Surface, agent) -> None:
-    font = pygame.font.SysFont("consolas", 16)
-    text = font.render(f"Credits: {agent.credits}", True, WHITE)
+    text = render_text(get_font(16), f"Credits: {agent.credits}", WHITE)
     surface.blit(text, (16, 40))
+
+
+# ---------------------------------------------------------------------------
+# Profiler overlay
+# ---------------------------------------------------------------------------
+
+class ProfilerOverlay:
+    """Panel listing the profiler's rolling per stage milliseconds and counters.
+
+    The numbers change every frame, so the lines are rendered straight from
+    the font instead of through the shared text cache, and the panel is only
+    rebuilt every ``refresh_ms``.
+    """
+
+    def __init__(self, refresh_ms: int = PROFILE_OVERLAY_MS):
+        self.refresh_ms = refresh_ms
+        self.panel = None
+        self.last = None
+
+    def _build(self, profiler) -> pygame.Surface:
+        font = get_font(14)
+        times, counts = profiler.averages()
+        lines = [f"frame avg over {len(profiler.history)} frames"]
+        lines += [f"{name:<16}{ms:7.2f} ms" for name, ms in sorted(times.items(), key=lambda kv: -kv[1])]
+        lines += [f"{name:<16}{n:9.1f}" for name, n in sorted(counts.items())]
+        h = 8 + 16 * len(lines)
+        panel = pygame.Surface((260, h), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, WHITE), (8, 4 + 16 * i))
+        return panel
+
+    def draw(self, surface: pygame.Surface, profiler) -> None:
+        now = get_ticks()
+        if self.panel is None or self.last is None or now - self.last >= self.refresh_ms:
+            self.panel = self._build(profiler)
+            self.last = now
+        # right aligned with the minimap and just below it, which it would hide
+        surface.blit(self.panel, (surface.get_width() - self.panel.get_width() - 20, MINIMAP_SIZE + 28))
+
+
+_profiler_overlay = None
+
+
+def draw_profiler(surface: pygame.Surface, profiler) -> None:
+    """Render the profiler overlay on the right of ``surface``, below the minimap."""
+
+    global _profiler_overlay
+    if _profiler_overlay is None:
+        _profiler_overlay = ProfilerOverlay()
+    _profiler_overlay.draw(surface, profiler)
@@ -0,0 +1,142 @@
+"""On-disk cache of built world artifacts.
+
+Data derived from the walkability grid, such as clearance maps or navigation
+tables, only depends on the grid and takes far longer to build than to load.
+Entries are keyed by :func:`grid_key`, a hash of the walkability array, and
+stored as plain ``.npy`` files that are memory-mapped on load, so a cache hit
+costs little more than opening a few files.  The grid itself is rasterized
+faster than a cache hit and is always built in memory.
+
+Layout::
+
+    <root>/<key>/meta.json      version stamp and creation time
+    <root>/<key>/<name>.npy     one file per artifact
+
+The total size of the cache is bounded; least recently used entries are
+removed first.  Bump :data:`CACHE_VERSION` whenever the way an artifact is
+built changes so stale entries are thrown away.
+"""
+
+import hashlib, json, os, shutil, tempfile, time
+
+import numpy as np
+
+from config import COLS, ROWS, WORLD_CACHE_DIR, WORLD_CACHE_MAX_BYTES
+
+CACHE_VERSION = 1
+
+
+def grid_key(walk):
+    """Hash of a walkability array, for artifacts derived from the grid alone."""
+
+    walk = np.ascontiguousarray(walk, dtype=bool)
+    h = hashlib.sha256()
+    h.update(repr(("grid", walk.shape, COLS, ROWS)).encode())
+    h.update(walk.tobytes())
+    return h.hexdigest()[:32]
+
+
+class WorldCache:
+    """Directory of memory-mappable world artifacts keyed by :func:`grid_key`."""
+
+    def __init__(self, root=WORLD_CACHE_DIR, max_bytes=WORLD_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def _meta(self, key):
+        try:
+            with open(os.path.join(self._entry(key), "meta.json")) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != CACHE_VERSION:
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            return None
+        return meta
+
+    def load(self, key, name):
+        """Return artifact ``name`` of entry ``key`` memory-mapped, or ``None``."""
+
+        if self._meta(key) is None:
+            return None
+        path = os.path.join(self._entry(key), name + ".npy")
+        try:
+            arr = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        # mark as recently used for eviction
+        try:
+            os.utime(os.path.join(self._entry(key), "meta.json"))
+        except OSError:
+            pass
+        return arr
+
+    def store(self, key, name, arr):
+        """Write artifact ``name`` for entry ``key`` and enforce the size bound."""
+
+        entry = self._entry(key)
+        if self._meta(key) is None:
+            os.makedirs(entry, exist_ok=True)
+            meta = {"version": CACHE_VERSION, "created": time.time()}
+            self._write_atomic(entry, "meta.json", lambda fh: fh.write(json.dumps(meta).encode()))
+        self._write_atomic(entry, name + ".npy", lambda fh: np.save(fh, np.ascontiguousarray(arr)))
+        self.evict()
+
+    def get_or_build(self, key, name, build):
+        """Load artifact ``name`` or create it with ``build()`` and store it."""
+
+        arr = self.load(key, name)
+        if arr is not None:
+            return arr
+        arr = build()
+        try:
+            self.store(key, name, arr)
+        except OSError:
+            # a read only or full disk just means no caching
+            pass
+        return arr
+
+    def _write_atomic(self, entry, filename, write):
+        fd, tmp = tempfile.mkstemp(dir=entry, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            os.replace(tmp, os.path.join(entry, filename))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+
+        entries = []
+        total = 0
+        for key in os.listdir(self.root):
+            entry = self._entry(key)
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(entry))
+                used = os.stat(os.path.join(entry, "meta.json")).st_mtime
+            except OSError:
+                continue
+            entries.append((used, size, entry))
+            total += size
+        for used, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+_default = None
+
+
+def default_cache():
+    global _default
+    if _default is None:
+        _default = WorldCache()
+    return _default
+